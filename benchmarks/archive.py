@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+import sys
+import os
+import argparse
+import importlib.util
+import io
+import resource
+import tarfile
+import time
+
+
+class NullWriter(io.RawIOBase):
+
+    def __init__(self):
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        n = len(data)
+        self.size += n
+        return n
+
+
+def load_share(path):
+    spec = importlib.util.spec_from_file_location('share', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_tree(root, files, per_dir):
+    marker = os.path.join(root, f'.share-benchmark-{files}-{per_dir}')
+    if os.path.exists(marker):
+        return
+    for i in range(files):
+        if i % per_dir == 0:
+            d = os.path.join(root, f'{i // per_dir // 100:04d}', f'{i // per_dir % 100:02d}')
+            os.makedirs(d, exist_ok=True)
+        with open(os.path.join(d, f'file-{i}.dat'), 'wb') as f:
+            if i % 100 == 0:
+                f.write(b'x' * (i % 4096))
+    open(marker, 'w').close()
+
+
+def run(share, root, rules):
+    handler = share.DirectoryShareHandler.__new__(share.DirectoryShareHandler)
+    handler._all = False
+    handler.is_hidden = handler._is_hidden_unix
+    handler._timings = {}
+    handler._authenticated = not rules
+    share.BaseHandler.rule_matcher = share.AuthRuleMatcher(rules or ['*'])
+    writer = NullWriter()
+    start = time.perf_counter()
+    cpu = time.process_time()
+    with tarfile.open(None, 'w|', writer, 65536) as tar:
+        handler.archive_folder(root, '', '', tar)
+    return time.perf_counter() - start, time.process_time() - cpu, writer.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='benchmark archive traversal of a synthetic tree')
+    parser.add_argument('tree', help='directory for the synthetic tree, reused between runs')
+    parser.add_argument(
+        '--share',
+        default=os.path.join(os.path.dirname(__file__), '..', 'share.py'),
+        help='path to share.py',
+    )
+    parser.add_argument(
+        '-n', '--files', type=int, default=1000000, help='files in the tree [default: 1000000]'
+    )
+    parser.add_argument(
+        '--per-dir', type=int, default=1000, help='files per directory [default: 1000]'
+    )
+    parser.add_argument(
+        '-R',
+        '--auth-rule',
+        dest='rules',
+        action='append',
+        help='auth rules to check each entry against, unauthenticated',
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.tree, exist_ok=True)
+    start = time.perf_counter()
+    create_tree(args.tree, args.files, args.per_dir)
+    sys.stderr.write(f'tree ready in {time.perf_counter() - start:.1f}s\n')
+    share = load_share(args.share)
+    seconds, cpu, size = run(share, args.tree, args.rules)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        f'{args.files} files: {seconds:.2f}s wall, {cpu:.2f}s cpu, '
+        f'{args.files / seconds:.0f} files/s, {size / 1e6:.1f} MB of tar, max rss {rss / 1024:.0f} MiB'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/python3
+import sys
+import os
+import argparse
+import base64
+import http.client
+import json
+import random
+import shlex
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+
+SCENARIOS = ('listing', 'download', 'range', 'zstd', 'archive', 'multipart', 'put', 'auth')
+
+
+class Fixture:
+
+    def __init__(self, root, entries, file_size, tree_files, upload_size):
+        self.root = root
+        self.file_size = file_size
+        self.upload = os.urandom(upload_size)
+        os.makedirs(f'{root}/listing')
+        for i in range(entries):
+            with open(f'{root}/listing/file-{i}.txt', 'wb') as f:
+                f.write(b'x' * (i % 4096))
+        with open(f'{root}/file.bin', 'wb') as f:
+            block = os.urandom(65536) + b'share benchmark ' * 4096
+            for _ in range(file_size // len(block)):
+                f.write(block)
+            f.write(block[: file_size % len(block)])
+        for i in range(tree_files):
+            d = f'{root}/tree/{i % 32}/{i % 7}'
+            os.makedirs(d, exist_ok=True)
+            with open(f'{d}/{i}.dat', 'wb') as f:
+                f.write(os.urandom(512) * (1 + i % 16))
+        with open(f'{root}/small.txt', 'wb') as f:
+            f.write(b'hello\n')
+        os.makedirs(f'{root}/upload')
+
+
+class Server:
+
+    def __init__(self, python, script, root, args):
+        self._port = get_free_port()
+        self.host = ('127.0.0.1', self._port)
+        cmd = [python, script, '-b', '127.0.0.1', '-p', str(self._port), *args, root]
+        env = dict(os.environ, SHARE_LOG_TIME='false')
+        self._proc = subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env
+        )
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                socket.create_connection(self.host, timeout=1).close()
+                break
+            except OSError:
+                if self._proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f'failed to start: {" ".join(cmd)}')
+                time.sleep(0.05)
+        self._start_cpu = self._read_cpu()
+
+    def stop(self):
+        self._proc.send_signal(signal.SIGINT)
+        _, _, rusage = os.wait4(self._proc.pid, 0)
+        self._proc.returncode = 0
+        cpu = rusage.ru_utime + rusage.ru_stime
+        return cpu - self._start_cpu
+
+    def _read_cpu(self):
+        try:
+            with open(f'/proc/{self._proc.pid}/stat') as f:
+                fields = f.read().rpartition(')')[2].split()
+            return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        except (OSError, ValueError):
+            return 0.0
+
+
+def get_free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def make_request(scenario, fixture, worker, i):
+    headers = {'Accept': 'text/html'}
+    body = None
+    if scenario == 'listing':
+        return 'GET', '/listing/', headers, body
+    if scenario == 'download':
+        return 'GET', '/file.bin', headers, body
+    if scenario == 'range':
+        start = random.randrange(max(fixture.file_size - 1048576, 1))
+        headers['Range'] = f'bytes={start}-{min(start + 1048575, fixture.file_size - 1)}'
+        return 'GET', '/file.bin', headers, body
+    if scenario == 'zstd':
+        headers['Accept-Encoding'] = 'zstd'
+        return 'GET', '/file.bin', headers, body
+    if scenario == 'archive':
+        return 'GET', '/tree.tar.zst', headers, body
+    if scenario == 'multipart':
+        boundary = uuid.uuid4().hex
+        body = b''.join(
+            (
+                f'--{boundary}\r\n'.encode(),
+                f'Content-Disposition: form-data; name="file"; filename="m{worker}-{i}.bin"\r\n\r\n'.encode(),
+                fixture.upload,
+                f'\r\n--{boundary}--\r\n'.encode(),
+            )
+        )
+        headers['Accept'] = 'text/plain'
+        headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        return 'POST', '/upload/', headers, body
+    if scenario == 'put':
+        return 'PUT', f'/upload/p{worker}-{i}.bin', headers, fixture.upload
+    if scenario == 'auth':
+        headers['Authorization'] = 'Basic ' + base64.b64encode(b'user:benchmark').decode()
+        return 'GET', '/small.txt', headers, body
+    raise ValueError(scenario)
+
+
+def server_args(scenario):
+    if scenario in ('multipart', 'put'):
+        return ['-s', '-r']
+    if scenario == 'auth':
+        return ['-P', 'benchmark']
+    return []
+
+
+def run_clients(scenario, fixture, host, concurrency, duration, requests):
+    deadline = time.monotonic() + duration
+    lock = threading.Lock()
+    latencies, errors, transferred = [], [0], [0]
+    counter = iter(range(requests)) if requests else None
+
+    def client(worker):
+        conn = http.client.HTTPConnection(*host, timeout=60)
+        i = 0
+        while time.monotonic() < deadline:
+            if counter is not None:
+                with lock:
+                    if next(counter, None) is None:
+                        break
+            method, path, headers, body = make_request(scenario, fixture, worker, i)
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                size = 0
+                while chunk := response.read(1048576):
+                    size += len(chunk)
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(*host, timeout=60)
+                ok, size = False, 0
+            elapsed = time.perf_counter() - start
+            if body:
+                size += len(body)
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                    transferred[0] += size
+                else:
+                    errors[0] += 1
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, sorted(latencies), errors[0], transferred[0]
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_scenario(args, fixture, scenario):
+    extra_args = shlex.split(args.server_args)
+    server = Server(args.python, args.share, fixture.root, server_args(scenario) + extra_args)
+    try:
+        elapsed, latencies, errors, transferred = run_clients(
+            scenario, fixture, server.host, args.concurrency, args.duration, args.requests
+        )
+    finally:
+        cpu = server.stop()
+    gigabytes = transferred / 1e9
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'megabytes_per_second': round(transferred / 1e6 / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1e3, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1e3, 3) if latencies else None,
+        'server_cpu_seconds': round(cpu, 3),
+        'server_cpu_ms_per_request': round(cpu * 1e3 / len(latencies), 3) if latencies else None,
+        'server_cpu_seconds_per_gb': round(cpu / gigabytes, 3) if gigabytes else None,
+    }
+
+
+def get_revision(script):
+    try:
+        return subprocess.run(
+            [
+                'git',
+                '-C',
+                os.path.dirname(os.path.abspath(script)),
+                'describe',
+                '--always',
+                '--dirty',
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(base, results):
+    keys = (
+        'requests_per_second',
+        'megabytes_per_second',
+        'p50_ms',
+        'p99_ms',
+        'server_cpu_ms_per_request',
+        'server_cpu_seconds_per_gb',
+    )
+    lines = [f'{"scenario":<10} ' + ' '.join(f'{k:>26}' for k in keys)]
+    for scenario, result in results['scenarios'].items():
+        old = base['scenarios'].get(scenario)
+        if not old:
+            continue
+        cells = []
+        for k in keys:
+            if old.get(k) and result.get(k) is not None:
+                cells.append(
+                    f'{old[k]:>10} -> {result[k]:<8} {(result[k] / old[k] - 1) * 100:+5.0f}%'
+                )
+            else:
+                cells.append(f'{"-":>26}')
+        lines.append(f'{scenario:<10} ' + ' '.join(cells))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='load test share over loopback')
+    parser.add_argument(
+        'scenarios',
+        nargs='*',
+        metavar='SCENARIO',
+        help=f'scenarios to run: {", ".join(SCENARIOS)} [default: all]',
+    )
+    parser.add_argument(
+        '--share',
+        default=os.path.join(os.path.dirname(__file__), '..', 'share.py'),
+        help='path to share.py',
+    )
+    parser.add_argument('--python', default=sys.executable, help='python used to run share.py')
+    parser.add_argument(
+        '-c', '--concurrency', type=int, default=8, help='concurrent clients [default: 8]'
+    )
+    parser.add_argument(
+        '-d', '--duration', type=float, default=5, help='seconds per scenario [default: 5]'
+    )
+    parser.add_argument(
+        '-n',
+        '--requests',
+        type=int,
+        default=0,
+        help='requests per scenario, 0 for unlimited [default: 0]',
+    )
+    parser.add_argument(
+        '--entries', type=int, default=2000, help='entries in the listed directory [default: 2000]'
+    )
+    parser.add_argument(
+        '--file-size',
+        type=int,
+        default=64 << 20,
+        help='size of the downloaded file [default: 64 MiB]',
+    )
+    parser.add_argument(
+        '--tree-files', type=int, default=2000, help='files in the archived tree [default: 2000]'
+    )
+    parser.add_argument(
+        '--upload-size', type=int, default=1 << 20, help='size of each upload [default: 1 MiB]'
+    )
+    parser.add_argument(
+        '--server-args', default='', help='extra arguments passed to share, e.g. "-w 4"'
+    )
+    parser.add_argument('-o', '--output', help='write results as json to this file')
+    parser.add_argument(
+        '--compare', metavar='FILE', help='compare with results from a previous run'
+    )
+    args = parser.parse_args()
+    for scenario in args.scenarios:
+        if scenario not in SCENARIOS:
+            parser.error(f'unknown scenario: {scenario}')
+
+    results = {
+        'revision': get_revision(args.share),
+        'python': subprocess.run(
+            [args.python, '-VV'], capture_output=True, text=True
+        ).stdout.strip(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'cpus': os.cpu_count(),
+        'parameters': {
+            k: getattr(args, k)
+            for k in (
+                'concurrency',
+                'duration',
+                'requests',
+                'entries',
+                'file_size',
+                'tree_files',
+                'upload_size',
+                'server_args',
+            )
+        },
+        'scenarios': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='share-bench-') as root:
+        fixture = Fixture(root, args.entries, args.file_size, args.tree_files, args.upload_size)
+        for scenario in args.scenarios or SCENARIOS:
+            result = run_scenario(args, fixture, scenario)
+            results['scenarios'][scenario] = result
+            sys.stderr.write(f'{scenario}: {json.dumps(result)}\n')
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            sys.stderr.write(compare(json.load(f), results) + '\n')
+
+
+if __name__ == '__main__':
+    main()
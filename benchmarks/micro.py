@@ -0,0 +1,330 @@
+#!/usr/bin/python3
+import sys
+import os
+import argparse
+import base64
+import gc
+import hashlib
+import importlib.util
+import io
+import json
+import random
+import statistics
+import time
+from http.client import HTTPMessage
+
+
+def load_share(path):
+    spec = importlib.util.spec_from_file_location('share', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def random_name(rng):
+    stem = rng.choice(('IMG_', 'file-', 'Report ', 'a', 'track', 'v1.', '', 'data_'))
+    stem += str(rng.randrange(10000)) if rng.random() < 0.8 else ''
+    stem += rng.choice(('', '-final', ' (copy)', '_2', 'b'))
+    return (stem or 'untitled') + rng.choice(('.jpg', '.txt', '.tar.gz', '.mp4', '', '.pdf'))
+
+
+def bench_file_item_sort(share, rng):
+    items = [
+        share.FileItem(
+            ('.' if rng.random() < 0.05 else '') + random_name(rng), rng.random() < 0.1, 0
+        )
+        for _ in range(5000)
+    ]
+    return lambda: sorted(items)
+
+
+def bench_multipart_parser(share, rng):
+    boundary = '----shareBenchmarkBoundary7MA4YWxkTrZu0gW'
+    parts = []
+    for i in range(4):
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="f{i}.bin"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        parts.append(rng.randbytes(4 << 20))
+        parts.append(b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    body = b''.join(parts)
+    buffer = memoryview(bytearray(65536))
+
+    class Sink:
+        def write(self, data):
+            pass
+
+    def run():
+        parser = share.MultipartParser(io.BytesIO(body), boundary, len(body), buffer)
+        for mf in parser:
+            mf.transfer_to(Sink())
+
+    return run
+
+
+def bench_split_path(share, rng):
+    handler = share.BaseHandler.__new__(share.BaseHandler)
+    paths = []
+    for _ in range(10000):
+        segments = [random_name(rng).replace(' ', '%20') for _ in range(rng.randrange(1, 8))]
+        if rng.random() < 0.2:
+            segments.insert(rng.randrange(len(segments)), '..')
+        path = '/' + '/'.join(segments)
+        if rng.random() < 0.3:
+            path += '/?zip'
+        elif rng.random() < 0.3:
+            path += '?download&size=1'
+        paths.append(path)
+
+    def run():
+        for path in paths:
+            handler.path = path
+            handler._split_path()
+
+    return run
+
+
+def bench_parse_range(share, rng):
+    handler = share.BaseHandler.__new__(share.BaseHandler)
+    ranges = []
+    for _ in range(10000):
+        start = rng.randrange(1 << 30)
+        end = str(start + rng.randrange(1 << 20)) if rng.random() < 0.7 else ''
+        ranges.append(f'bytes={start}-{end}' if rng.random() < 0.95 else 'bytes=x-1')
+
+    def run():
+        for r in ranges:
+            handler._parse_range(r, 1 << 31)
+
+    return run
+
+
+def make_auth_rule_inputs(share, rng):
+    rules = [f'/public/{random_name(rng)}/*:GET' for _ in range(40)]
+    rules += [f'*/{random_name(rng)}*:GET,PUT' for _ in range(8)]
+    rules += ['/upload/*:POST,PUT', '/*.txt']
+    matcher = share.AuthRuleMatcher(rules)
+    requests = []
+    for _ in range(10000):
+        path = '/' + '/'.join(random_name(rng) for _ in range(rng.randrange(1, 6)))
+        if rng.random() < 0.1:
+            path += '.tar.zst'
+        requests.append((rng.choice(('GET', 'GET', 'GET', 'POST', 'PUT')), path))
+    return matcher, requests
+
+
+def bench_auth_rule_match(share, rng):
+    matcher, requests = make_auth_rule_inputs(share, rng)
+
+    def run():
+        for method, path in requests:
+            matcher.match(method, path)
+
+    return run
+
+
+def bench_auth_rule_match_uncached(share, rng):
+    matcher, requests = make_auth_rule_inputs(share, rng)
+    match = getattr(matcher, '_match', matcher.match)
+
+    def run():
+        for method, path in requests:
+            match(method, path)
+
+    return run
+
+
+def bench_authenticate(share, rng):
+    password = 'benchmark-password'
+    authenticator = share.Authenticator(password)
+    encoded = base64.b64encode(hashlib.sha256(f'share:{password}'.encode()).digest()).decode()
+    headers = []
+    for i in range(2000):
+        message = HTTPMessage()
+        message['Host'] = 'localhost'
+        message['User-Agent'] = 'benchmark'
+        kind = i % 4
+        if kind == 0:
+            message['Authorization'] = (
+                'Basic ' + base64.b64encode(f'user:{password}'.encode()).decode()
+            )
+        elif kind == 1:
+            message['Authorization'] = 'Basic ' + base64.b64encode(b'user:wrong').decode()
+        elif kind == 2:
+            message['Cookie'] = f'theme=dark; password={encoded}'
+        headers.append(message)
+
+    def run():
+        for message in headers:
+            authenticator.authenticate(message)
+
+    return run
+
+
+def bench_html_listing(share, rng):
+    handler = share.DirectoryShareHandler.__new__(share.DirectoryShareHandler)
+    handler.path_only = '/some/deep/directory/'
+    handler._hostname = 'benchmark'
+    handler._upload = True
+    dirs = sorted(share.FileItem(random_name(rng), rng.random() < 0.1, 0) for _ in range(500))
+    files = sorted(
+        share.FileItem(random_name(rng), rng.random() < 0.1, rng.randrange(1 << 34))
+        for _ in range(5000)
+    )
+    return lambda: handler.build_html(dirs, files)
+
+
+def bench_block_checksums(share, rng):
+    data = rng.randbytes(32 << 20)
+    return lambda: share.get_block_checksums(io.BytesIO(data), len(data), 131072)
+
+
+BENCHMARKS = {
+    'file_item_sort': bench_file_item_sort,
+    'multipart_parser': bench_multipart_parser,
+    'split_path': bench_split_path,
+    'parse_range': bench_parse_range,
+    'auth_rule_match': bench_auth_rule_match,
+    'auth_rule_match_uncached': bench_auth_rule_match_uncached,
+    'authenticate': bench_authenticate,
+    'html_listing': bench_html_listing,
+    'block_checksums': bench_block_checksums,
+}
+
+
+def calibrate():
+    d = {}
+    for i in range(300000):
+        d[str(i)] = i * 2
+    sorted(d.items(), key=lambda x: -x[1])
+
+
+def time_func(func, min_time):
+    best = None
+    deadline = time.perf_counter() + min_time
+    while True:
+        start = time.perf_counter()
+        func()
+        end = time.perf_counter()
+        best = end - start if best is None else min(best, end - start)
+        if end >= deadline:
+            return best
+
+
+def measure(funcs, rounds, min_time):
+    timings = {name: [] for name in funcs}
+    calibrations = []
+    for func in funcs.values():
+        func()
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            for name, func in funcs.items():
+                calibrations.append(time_func(calibrate, min_time))
+                timings[name].append(time_func(func, min_time))
+    finally:
+        gc.enable()
+    noise = {name: statistics.median(times) / min(times) - 1 for name, times in timings.items()}
+    return {name: min(times) for name, times in timings.items()}, noise, min(calibrations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='microbenchmarks for hot helpers in share')
+    parser.add_argument(
+        'benchmarks',
+        nargs='*',
+        metavar='BENCHMARK',
+        help=f'benchmarks to run: {", ".join(BENCHMARKS)} [default: all]',
+    )
+    parser.add_argument(
+        '--share',
+        default=os.path.join(os.path.dirname(__file__), '..', 'share.py'),
+        help='path to share.py',
+    )
+    parser.add_argument(
+        '-r',
+        '--rounds',
+        type=int,
+        default=15,
+        help='timed rounds over all benchmarks, the fastest run of each is kept [default: 15]',
+    )
+    parser.add_argument(
+        '--min-time',
+        type=float,
+        default=0.2,
+        help='seconds each benchmark is repeated for in every round [default: 0.2]',
+    )
+    parser.add_argument(
+        '-b',
+        '--baseline',
+        default=os.path.join(os.path.dirname(__file__), 'baseline.json'),
+        help='baseline results [default: benchmarks/baseline.json]',
+    )
+    parser.add_argument(
+        '-t',
+        '--threshold',
+        type=float,
+        default=0.15,
+        help='allowed slowdown on top of the measured noise, as a fraction [default: 0.15]',
+    )
+    parser.add_argument('--save', action='store_true', help='write the results as the new baseline')
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f'unknown benchmark: {name}')
+
+    share = load_share(args.share)
+    funcs = {
+        name: BENCHMARKS[name](share, random.Random(0)) for name in args.benchmarks or BENCHMARKS
+    }
+    timings, noise, calibration = measure(funcs, args.rounds, args.min_time)
+    results = {
+        name: {'seconds': round(seconds, 6), 'relative': round(seconds / calibration, 4)}
+        for name, seconds in timings.items()
+    }
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = None
+
+    regressions = []
+    print(f'{"benchmark":<26} {"ms":>10} {"noise":>7} {"baseline ms":>12} {"change":>8}')
+    for name, result in results.items():
+        line = f'{name:<26} {result["seconds"] * 1e3:>10.3f} {noise[name] * 100:>6.1f}%'
+        old = baseline['benchmarks'].get(name) if baseline else None
+        if old:
+            change = result['relative'] / old['relative'] - 1
+            expected = old['relative'] * calibration
+            line += f' {expected * 1e3:>12.3f} {change * 100:>+7.1f}%'
+            if change > args.threshold + noise[name]:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(
+                {
+                    'python': sys.version.split()[0],
+                    'calibration_seconds': round(calibration, 6),
+                    'benchmarks': {**(baseline['benchmarks'] if baseline else {}), **results},
+                },
+                f,
+                indent=2,
+            )
+            f.write('\n')
+    elif regressions:
+        print(
+            f'{len(regressions)} benchmark(s) slower than the baseline by more than '
+            f'{args.threshold * 100:.0f}% plus noise: {", ".join(regressions)}',
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
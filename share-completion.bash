@@ -2,13 +2,16 @@ _share() {
     local cur prev words cword commands
     _comp_initialize || return $?
     if [[ "$cur" == -* ]]; then
-        COMPREPLY=($(compgen -W '-b --bind -p --port -s --share -r --receive -a --all -z --archive -t --text -P --password -R --auth-rule -q --qrcode -h --help -v --version --certfile --keyfile --keypass' -- "$cur"))
+        COMPREPLY=($(compgen -W '-b --bind -p --port -s --share -r --receive -a --all -z --archive -t --text -P --password -R --auth-rule -q --qrcode --index --pull -k --insecure -w --workers -h --help -v --version --backlog --send-buffer --receive-buffer --chunk-size --no-nodelay --disk-io-size --socket-io-size --readahead-size --drop-cache-size --block-size --hash-index --max-upload-size --write-behind-size --metrics --access-log --access-log-format --access-log-max-size --access-log-backups --server-timing --profile --profile-path --profile-aggregate --certfile --keyfile --keypass --handshake-timeout --tls-tickets' -- "$cur"))
     else
         case "$prev" in
             '-b')
                 _comp_compgen_ip_addresses -a
                 ;;
-            '-p' | '--port' | '-R' | '--auth-rule' | '-h' | '--help' | '-v' | '--version' | '--keypass') ;;
+            '--access-log-format')
+                COMPREPLY=($(compgen -W 'json combined' -- "$cur"))
+                ;;
+            '-p' | '--port' | '-R' | '--auth-rule' | '--index' | '--pull' | '-w' | '--workers' | '-h' | '--help' | '-v' | '--version' | '--keypass' | '--backlog' | '--send-buffer' | '--receive-buffer' | '--chunk-size' | '--disk-io-size' | '--socket-io-size' | '--readahead-size' | '--drop-cache-size' | '--block-size' | '--max-upload-size' | '--write-behind-size' | '--metrics' | '--access-log-max-size' | '--access-log-backups' | '--profile-path' | '--handshake-timeout' | '--tls-tickets') ;;
             *)
                 if ! [[ -d "$prev" ]]; then
                     _comp_compgen_filedir
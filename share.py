@@ -6,6 +6,7 @@ import argparse
 import functools
 from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler, HTTPStatus
 from http import cookies
+import http.client
 from urllib import parse
 import html
 import mimetypes
@@ -19,10 +20,72 @@ import socket
 import ssl
 import tarfile
 import fnmatch
+import atexit
+import json
+import queue
+import mmap
+import struct
+import threading
+import traceback
+import contextlib
+import cProfile
+import pstats
+import errno
+import shutil
+import zlib
+import collections
+import array
+import bisect
+import itertools
+
+try:
+    import pwd
+    import grp
+except ImportError:
+    pwd = None
+    grp = None
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 class ShareServer(ThreadingHTTPServer):
-    pass
+
+    request_queue_size = 128
+    send_buffer_size = None
+    receive_buffer_size = None
+    tcp_nodelay = True
+    handshake_timeout = 10
+
+    def server_bind(self):
+        if self.receive_buffer_size:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+        super().server_bind()
+
+    def get_request(self):
+        request, client_address = super().get_request()
+        if self.send_buffer_size:
+            request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer_size)
+        if self.tcp_nodelay:
+            request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return request, client_address
+
+    def finish_request(self, request, client_address):
+        if isinstance(request, ssl.SSLSocket):
+            try:
+                request.settimeout(self.handshake_timeout)
+                request.do_handshake()
+                request.settimeout(None)
+            except OSError:
+                return
+        super().finish_request(request, client_address)
 
 
 class ZstdAdapter:
@@ -33,6 +96,9 @@ class ZstdAdapter:
     def get_writer(self, file):
         raise NotImplementedError
 
+    def get_reader(self, file):
+        raise NotImplementedError
+
 
 class InternalZstdAdapter(ZstdAdapter):
 
@@ -41,6 +107,7 @@ class InternalZstdAdapter(ZstdAdapter):
 
         self._zstd = zstd
         self._options = {zstd.CompressionParameter.checksum_flag: True}
+        self.error = zstd.ZstdError
 
     def compress(self, data):
         return self._zstd.compress(data, options=self._options)
@@ -48,6 +115,9 @@ class InternalZstdAdapter(ZstdAdapter):
     def get_writer(self, file):
         return self._zstd.open(file, 'wb', options=self._options)
 
+    def get_reader(self, file):
+        return self._zstd.open(file, 'rb')
+
 
 class ExnternalZstdAdapter(ZstdAdapter):
 
@@ -55,6 +125,8 @@ class ExnternalZstdAdapter(ZstdAdapter):
         import zstandard
 
         self._zstd = zstandard.ZstdCompressor(write_checksum=True)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self.error = zstandard.ZstdError
 
     def compress(self, data):
         return self._zstd.compress(data)
@@ -62,6 +134,9 @@ class ExnternalZstdAdapter(ZstdAdapter):
     def get_writer(self, file):
         return self._zstd.stream_writer(file, write_return_read=True, closefd=False)
 
+    def get_reader(self, file):
+        return self._decompressor.stream_reader(file, read_across_frames=True, closefd=False)
+
 
 class BaseHandler(BaseHTTPRequestHandler):
 
@@ -70,12 +145,39 @@ class BaseHandler(BaseHTTPRequestHandler):
         'AAABAAMAMDAAAAEAIACoJQAANgAAACAgAAABACAAqBAAAN4lAAAQEAAAAQAgAGgEAACGNgAAKAAAADAAAABgAAAAAQAgAAAAAAAAJAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAFxszwhcbM8U3GzPGZxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8ZnGzPFNxszwhcbM8AQAAAAAAAAAAAAAAAAAAAAAAAAAAcbM8B3GzPGxxszzccbM8/HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPxxszzccbM8bHGzPAcAAAAAAAAAAAAAAAAAAAAAcbM8bHGzPPZxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM89nGzPGwAAAAAAAAAAAAAAABxszwhcbM823GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNtxszwhAAAAAAAAAABxszxTcbM8+3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPtxszxTAAAAAAAAAABxszxmcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxmAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8+3GzPOFxszzHcbM8x3GzPOFxszz8cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzccbM8bHGzPCJxszwMcbM8DXGzPCJxszxscbM83XGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNNxszw3AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAcbM8OHGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM88XGzPE0AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPE5xszzycbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8s3GzPAgAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAlxszy0cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8fQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszx+cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8bgAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszxvcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz+cbM8cwAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszyFcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPOFxszx4cbM8FQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPBBxszzCcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz0cbM8onGzPC9xszwBAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPGZxszz5cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP5xszzccbM8mXGzPHFxszxxcbM8mHGzPNxxszz+cbM8/XGzPMdxszxScbM8CAAAAAAAAAAAcbM8AXGzPDJxszxDcbM8BAAAAAAAAAAAAAAAAAAAAABxszwDcbM8V3GzPOZxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8+3GzPKBxszwkcbM8AQAAAAAAAAAAcbM8AXGzPCVxszyTcbM8fHGzPBcAAAAAAAAAAAAAAABxszwXcbM8enGzPORxszzvcbM8lXGzPEJxszwkcbM8JHGzPENxszyVcbM873GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8oHGzPA4AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszwEcbM8AgAAAAAAAAAAcbM8B3GzPFFxszzGcbM8/XGzPP9xszz/cbM8/3GzPPVxszzlcbM85XGzPPVxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzdcbM8JwAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAFxszwucbM8oXGzPPRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszyacbM8AQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPFRxszzicbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxzAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPHRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxzAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPHRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszyacbM8AQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPFNxszzicbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzdcbM8JwAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAFxszwucbM8oHGzPPNxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8n3GzPA4AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszwEcbM8AgAAAAAAAAAAcbM8B3GzPFFxszzGcbM8/XGzPP9xszz/cbM8/3GzPPVxszzlcbM85XGzPPVxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8+3GzPKBxszwkcbM8AQAAAAAAAAAAcbM8AXGzPCVxszyTcbM8fHGzPBcAAAAAAAAAAAAAAABxszwWcbM8enGzPORxszzvcbM8lXGzPEJxszwkcbM8JHGzPENxszyVcbM873GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP5xszzccbM8mXGzPHFxszxxcbM8mHGzPNxxszz+cbM8/XGzPMdxszxScbM8CAAAAAAAAAAAcbM8AXGzPDJxszxCcbM8BAAAAAAAAAAAAAAAAAAAAABxszwDcbM8VnGzPOZxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz0cbM8onGzPC9xszwBAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPGZxszz5cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPOJxszx4cbM8FQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPBBxszzCcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz+cbM8cwAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszyFcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8bgAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszxvcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8fQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszx+cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8s3GzPAgAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAlxszy0cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM88XGzPE0AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPE5xszzycbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNNxszw3AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAcbM8OHGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzccbM8bHGzPCJxszwMcbM8DXGzPCJxszxscbM83XGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8+3GzPOFxszzHcbM8x3GzPOFxszz8cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxncbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxnAAAAAAAAAABxszxmcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszxmAAAAAAAAAABxszxTcbM8+3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPtxszxTAAAAAAAAAABxszwhcbM823GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNtxszwhAAAAAAAAAAAAAAAAcbM8bHGzPPZxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM89nGzPGwAAAAAAAAAAAAAAAAAAAAAcbM8B3GzPGxxszzccbM8/HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPxxszzccbM8bHGzPAcAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAFxszwhcbM8U3GzPGZxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8Z3GzPGdxszxncbM8ZnGzPFNxszwhcbM8AQAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAP///////wAA////////AADwAAAAAA8AAOAAAAAABwAAwAAAAAADAADAAAAAAAMAAMAAAAAAAwAAwAAAAAADAADAAAAAAAMAAMAAAAfgAwAAwAAAD/ADAADAAAAf+AMAAMAAAB/4AwAAwAAAP/wDAADAAAA//AMAAMAAAD/4AwAAwAAAf/gDAADAAAD/+AMAAMABg//wAwAAwAfv48ADAADAD/+AAAMAAMAf/gAAAwAAwB/8AAADAADAP/wAAAMAAMA//AAAAwAAwB/8AAADAADAH/4AAAMAAMAP/4AAAwAAwAfv48ADAADAAYP/8AMAAMAAAP/4AwAAwAAAf/gDAADAAAA/+AMAAMAAAD/8AwAAwAAAP/wDAADAAAAf+AMAAMAAAB/4AwAAwAAAD/ADAADAAAAH4AMAAMAAAAAAAwAAwAAAAAADAADAAAAAAAMAAMAAAAAAAwAAwAAAAAADAADgAAAAAAcAAPAAAAAADwAA////////AAD///////8AACgAAAAgAAAAQAAAAAEAIAAAAAAAABAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPAFxszwOcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8DnGzPAEAAAAAAAAAAAAAAABxszwHcbM8ZHGzPMFxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzBcbM8ZHGzPAcAAAAAAAAAAHGzPGRxszz2cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz2cbM8ZAAAAABxszwNcbM8v3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszy/cbM8DXGzPBhxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNRxszwYcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPlxszzdcbM80HGzPOdxszz+cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzjcbM8Z3GzPBxxszwRcbM8K3GzPJRxszz4cbM8/3GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM883GzPFcAAAAAAAAAAAAAAAAAAAAAcbM8CXGzPJhxszz/cbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszy8cbM8CwAAAAAAAAAAAAAAAAAAAAAAAAAAcbM8NHGzPO1xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPJwAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszwacbM823GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz2cbM8ewAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPCpxszzncbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPxxszz+cbM8/3GzPP9xszz9cbM8yHGzPFJxszwIAAAAAAAAAAAAAAAAAAAAAAAAAABxszwBcbM8fXGzPP9xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNZxszx6cbM8UXGzPGRxszy3cbM84HGzPHxxszwXAAAAAHGzPBlxszxtcbM8QnGzPAhxszwCcbM8EXGzPG1xszztcbM8/3GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszzKcbM8KwAAAAAAAAAAAAAAAHGzPBBxszwkcbM8AnGzPAhxszxTcbM8yHGzPP1xszztcbM8unGzPKlxszzLcbM8+HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM893GzPFIAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszwscbM8o3GzPPRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszzfcbM8HgAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPJlxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPN9xszweAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAcbM8mXGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM893GzPFIAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszwscbM8o3GzPPRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8ynGzPCsAAAAAAAAAAAAAAABxszwQcbM8JHGzPAJxszwIcbM8U3GzPMhxszz9cbM87XGzPLpxszypcbM8y3GzPPhxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM81nGzPHlxszxRcbM8ZHGzPLdxszzgcbM8fHGzPBcAAAAAcbM8GXGzPG1xszxCcbM8CHGzPAJxszwRcbM8bXGzPO1xszz/cbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPxxszz+cbM8/3GzPP9xszz9cbM8yHGzPFNxszwIAAAAAAAAAAAAAAAAAAAAAAAAAABxszwBcbM8fXGzPP9xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM89nGzPHsAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAABxszwqcbM853GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8nAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAHGzPBpxszzbcbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszy8cbM8CwAAAAAAAAAAAAAAAAAAAAAAAAAAcbM8NHGzPO1xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwZcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPNxszxXAAAAAAAAAAAAAAAAAAAAAHGzPAlxszyYcbM8/3GzPP9xszz/cbM8/3GzPP9xszzUcbM8GXGzPBlxszzUcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPONxszxncbM8HHGzPBFxszwrcbM8lHGzPPhxszz/cbM8/3GzPP9xszz/cbM8/3GzPNRxszwZcbM8GXGzPNRxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPlxszzdcbM80HGzPOdxszz+cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM81HGzPBlxszwYcbM81HGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszzUcbM8GHGzPA1xszy/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPL9xszwNAAAAAHGzPGRxszz2cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz2cbM8ZAAAAAAAAAAAcbM8B3GzPGRxszzBcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM81HGzPNRxszzUcbM8wXGzPGRxszwHAAAAAAAAAAAAAAAAcbM8AXGzPA5xszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwZcbM8GXGzPBlxszwOcbM8AQAAAAAAAAAA/////+AAAAfAAAADgAAAAYAAAAGAAAABgAAeAYAAPwGAAD+BgAA/gYAAf4GAAP+BgHP/AYD/gAGB/gABgfwAAYH8AAGB/gABgP+AAYBz/wGAAP+BgAB/gYAAP4GAAD+BgAA/AYAAHgGAAAABgAAAAYAAAAHAAAAD4AAAB/////8oAAAAEAAAACAAAAABACAAAAAAAAAEAAAAAAAAAAAAAAAAAAAAAAAAcbM8CnGzPFxxszyIcbM8iHGzPIhxszyIcbM8iHGzPIhxszyIcbM8iHGzPIhxszyIcbM8iHGzPIhxszxccbM8CnGzPFxxszzxcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM88XGzPFxxszyHcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz3cbM83XGzPO5xszz/cbM8/3GzPP9xszyHcbM8iHGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz1cbM8cXGzPBpxszxDcbM82HGzPP9xszz/cbM8iHGzPIhxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8y3GzPBEAAAAAAAAAAHGzPIdxszz/cbM8/3GzPIhxszyIcbM8/3GzPP9xszz/cbM8+3GzPPRxszz+cbM85XGzPG1xszwFAAAAAHGzPAVxszygcbM8/3GzPP9xszyIcbM8iHGzPP9xszz/cbM86HGzPGhxszw8cbM8bXGzPD1xszxXcbM8mXGzPGVxszyRcbM883GzPP9xszz/cbM8iHGzPIhxszz/cbM8/3GzPJEAAAAAAAAAAHGzPAVxszyPcbM893GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPIhxszyIcbM8/3GzPP9xszyRAAAAAAAAAABxszwFcbM8j3GzPPdxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszyIcbM8iHGzPP9xszz/cbM86HGzPGhxszw8cbM8bXGzPD1xszxXcbM8mXGzPGVxszyRcbM883GzPP9xszz/cbM8iHGzPIhxszz/cbM8/3GzPP9xszz7cbM89HGzPP5xszzlcbM8bXGzPAUAAAAAcbM8BXGzPKBxszz/cbM8/3GzPIhxszyIcbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPMtxszwRAAAAAAAAAABxszyHcbM8/3GzPP9xszyIcbM8iHGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz1cbM8cXGzPBpxszxDcbM82HGzPP9xszz/cbM8iHGzPIdxszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPdxszzdcbM87nGzPP9xszz/cbM8/3GzPIdxszxccbM88XGzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPP9xszz/cbM8/3GzPPFxszxccbM8CnGzPFxxszyIcbM8iHGzPIhxszyIcbM8iHGzPIhxszyIcbM8iHGzPIhxszyIcbM8iHGzPIhxszxccbM8CsADAACAAQAAAAAAAABwAAAAcAAAAPAAAA+gAAAOAAAADgAAAA+gAAAA8AAAAHAAAABwAAAAAAAAgAEAAMADAAA='
     )
     start_time = time.gmtime()
+    stats = None
+    metrics = None
+    metrics_path = None
+    access_log = None
+    profiler = None
+    server_timing = False
+    _no_timing = contextlib.nullcontext()
+    chunk_size = 65536
+    disk_io_size = 262144
+    socket_io_size = 65536
+    readahead_size = 4194304
+    drop_cache_size = 268435456
+    block_size = 131072
+    block_cache = None
+    hash_index = None
+    search_index = None
+    max_upload_size = None
+    write_behind_size = 8388608
     # fmt: off
     _control_char_table = str.maketrans({c: fr'\x{c:02x}' for c in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 92, 127, 128, 129, 130, 131, 132, 133, 134, 135, 136, 137, 138, 139, 140, 141, 142, 143, 144, 145, 146, 147, 148, 149, 150, 151, 152, 153, 154, 155, 156, 157, 158, 159)})
     # fmt: on
 
     def __init__(self, *args):
         self._authenticated = False
+        self._corked = False
+        self._disk_buffer = None
+        self._socket_buffer = None
+        self._request_start = None
+        self._samples = []
+        self._timings = {}
+        self._timing_active = False
+        if self.profiler:
+            self.handle_one_request = self._handle_one_request_profiled
         self._hostname = socket.gethostname()
         if sys.version_info >= (3, 14):
             self._zstd = InternalZstdAdapter()
@@ -87,26 +189,216 @@ class BaseHandler(BaseHTTPRequestHandler):
         self._should_log_time = True if os.getenv('SHARE_LOG_TIME', 'true') == 'true' else False
         super().__init__(*args)
 
+    def setup(self):
+        super().setup()
+        self.wfile = SocketWriter(self.connection)
+        if self.stats:
+            self.stats.add('connections')
+        if self.metrics:
+            self.metrics.commit((('share_connections', (), 1),))
+
+    def finish(self):
+        if self.metrics:
+            self.metrics.commit((('share_connections', (), -1),))
+        super().finish()
+
     def handle_one_request(self):
         try:
             super().handle_one_request()
         except Exception as e:
             self.close_connection = True
             self.log_error(f'{type(e).__name__}: {e}'.removesuffix(': '))
+        finally:
+            if self._corked:
+                self._set_cork(False)
+        if self._request_start is not None:
+            self.end_request()
+
+    def _handle_one_request_profiled(self):
+        self.path_only = None
+        with self.profiler.profile() as profile:
+            BaseHandler.handle_one_request(self)
+        if profile and self.path_only is not None:
+            self.profiler.save(profile, self.command, self.path_only)
+
+    def parse_request(self):
+        self._request_start = time.perf_counter()
+        self._status = None
+        self._sent_mark = self.wfile.written
+        self._received_bytes = 0
+        self._content_encoding = None
+        self._timings = {}
+        self._timing_active = False
+        self._expect_continue = False
+        self.headers = None
+        return super().parse_request()
+
+    def handle_expect_100(self):
+        self._expect_continue = True
+        return True
+
+    def send_continue(self):
+        if self._expect_continue:
+            self._expect_continue = False
+            self.send_response_only(HTTPStatus.CONTINUE)
+            self.end_headers()
+
+    def end_request(self):
+        duration = time.perf_counter() - self._request_start
+        self._request_start = None
+        if self.stats:
+            self.stats.add('requests')
+        if self.metrics:
+            method = self.command if self.command in ('GET', 'HEAD', 'POST', 'PUT') else 'other'
+            handler = ('handler', type(self).__name__)
+            status = ('status', str(self._status))
+            self._samples.append(('share_requests_total', (handler, ('method', method), status), 1))
+            self._samples.append(('share_request_duration_seconds', (handler, status), duration))
+            self._samples.append(
+                ('share_sent_bytes_total', (), self.wfile.written - self._sent_mark)
+            )
+            self._samples.append(('share_received_bytes_total', (), self._received_bytes))
+            self.metrics.commit(self._samples)
+            self._samples = []
+        if self.access_log:
+            headers = self.headers or {}
+            self.access_log.log(
+                {
+                    'time': time.time(),
+                    'client': self.client_address[0],
+                    'port': self.client_address[1],
+                    'method': self.command,
+                    'path': getattr(self, 'path', None),
+                    'protocol': self.request_version,
+                    'status': self._status,
+                    'duration': round(duration, 6),
+                    'sent': self.wfile.written - self._sent_mark,
+                    'received': self._received_bytes,
+                    'range': headers.get('Range'),
+                    'encoding': self._content_encoding,
+                    'referer': headers.get('Referer'),
+                    'user_agent': headers.get('User-Agent'),
+                    'timing': {k: round(v * 1000, 3) for k, v in self._timings.items()},
+                }
+            )
+
+    def timing(self, name):
+        if not self.server_timing or self._timing_active:
+            return self._no_timing
+        return PhaseTimer(self, name)
+
+    def record(self, name, value, **labels):
+        if self.metrics:
+            self._samples.append((name, tuple(labels.items()), value))
+
+    def record_upload(self, size, start):
+        self._received_bytes += size
+        if self.metrics:
+            duration = time.perf_counter() - start
+            self.record('share_upload_bytes_total', size)
+            if duration > 0:
+                self.record('share_upload_throughput_bytes_per_second', size / duration)
+
+    def _set_cork(self, cork):
+        try:
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, cork)
+        except OSError:
+            return
+        self._corked = cork
+
+    def get_disk_buffer(self):
+        if self._disk_buffer is None:
+            self._disk_buffer = memoryview(bytearray(self.disk_io_size))
+        return self._disk_buffer
+
+    def advise(self, file, size, write=False):
+        if not hasattr(os, 'posix_fadvise'):
+            return contextlib.nullcontext(file)
+        readahead = 0 if write else self.readahead_size
+        drop = bool(self.drop_cache_size) and size >= self.drop_cache_size
+        if not drop and (write or size <= readahead * 2):
+            return contextlib.nullcontext(file)
+        return AdvisedFile(file, size, readahead, drop, write)
+
+    def write_behind(self, file, size):
+        if not self.write_behind_size:
+            return contextlib.nullcontext(file)
+        buffer_size = min(max(self.write_behind_size // 4, 65536), 1048576)
+        if size <= buffer_size:
+            return contextlib.nullcontext(file)
+        return WriteBehind(file, buffer_size, max(self.write_behind_size // buffer_size, 2))
+
+    @contextlib.contextmanager
+    def receive_file(self, file_path, size, digests):
+        hashers = {algorithm: new_hash(algorithm) for algorithm in digests}
+        if self.hash_index and 'sha-256' not in hashers:
+            hashers['sha-256'] = hashlib.sha256()
+        if digests:
+            staged = get_staging_path(file_path)
+        else:
+            staged = file_path
+        try:
+            with open(staged, 'xb' if digests else 'wb') as f:
+                with self.advise(f, size, write=True) as a:
+                    with self.write_behind(HashingWriter(a, hashers) if hashers else a, size) as w:
+                        yield w
+                computed = {algorithm: h.digest() for algorithm, h in hashers.items()}
+                if any(computed[algorithm] != digest for algorithm, digest in digests.items()):
+                    raise DigestMismatchError(
+                        {algorithm: computed[algorithm] for algorithm in digests}
+                    )
+                if digests:
+                    os.replace(staged, file_path)
+                if self.hash_index:
+                    f.flush()
+                    self.hash_index.put(file_path, f, os.fstat(f.fileno()), computed['sha-256'])
+        except BaseException:
+            if digests:
+                with contextlib.suppress(OSError):
+                    os.unlink(staged)
+            raise
+
+    def get_socket_buffer(self):
+        if self._socket_buffer is None:
+            self._socket_buffer = memoryview(bytearray(self.socket_io_size))
+        return self._socket_buffer
+
+    def is_url_valid(self, path):
+        return True
 
     def can_access(self, method, path):
         if self._authenticated:
             return True
-        return not self.rule_matcher.match(method, path)
+        with self.timing('rule'):
+            return not self.rule_matcher.match(method, path)
+
+    def can_access_all(self, method, prefix):
+        if self._authenticated:
+            return True
+        with self.timing('rule'):
+            return not self.rule_matcher.match_under(method, prefix)
 
     def do_GET(self):
         self._split_path()
-        self._authenticated = self.authenticator.authenticate(self.headers)
+        with self.timing('auth'):
+            self._authenticated = self.authenticator.authenticate(self.headers)
         if self.path_only == '/favicon.ico':
             self.respond_with_file('favicon.ico')
             return
+        if self.metrics and self.path_only == self.metrics_path:
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            if not self.can_access('GET', self.path_only):
+                self.respond_unauthorized()
+            elif self.command == 'HEAD':
+                self.respond_with_headers(content_type)
+            else:
+                self.respond_with_data(self.metrics.render().encode(), content_type)
+            return
         if 'login' in self.queries:
-            self.respond_with_html(self._build_html_for_password())
+            if self.command == 'HEAD':
+                self.respond_with_headers('text/html; charset=utf-8')
+            else:
+                self.respond_with_html(self._build_html_for_password())
             return
         if self.can_access('GET', self.path_only):
             self.handle_get()
@@ -116,13 +408,17 @@ class BaseHandler(BaseHTTPRequestHandler):
         else:
             self.respond_redirect(f'{parse.quote(self.path_only)}?login', connection='close')
 
+    def do_HEAD(self):
+        self.do_GET()
+
     def do_POST(self):
         self._split_path()
-        self._authenticated = self.authenticator.authenticate(self.headers)
+        with self.timing('auth'):
+            self._authenticated = self.authenticator.authenticate(self.headers)
         if 'login' in self.queries:
             self.authenticator.login(self)
             return
-        if self.can_access('POST', self.path_only):
+        if self.can_access(self.get_post_method(), self.path_only):
             self.handle_post()
             return
         if self.get_accept_content_type() == 'text/plain':
@@ -132,12 +428,16 @@ class BaseHandler(BaseHTTPRequestHandler):
 
     def do_PUT(self):
         self._split_path()
-        self._authenticated = self.authenticator.authenticate(self.headers)
+        with self.timing('auth'):
+            self._authenticated = self.authenticator.authenticate(self.headers)
         if self.can_access('PUT', self.path_only):
             self.handle_put()
             return
         self.respond_unauthorized()
 
+    def get_post_method(self):
+        return 'POST'
+
     def handle_get(self):
         self.respond_method_not_allowed()
 
@@ -181,6 +481,10 @@ class BaseHandler(BaseHTTPRequestHandler):
             self.respond_bad_request()
             return
         save_dir = f'{save_dir.rstrip("/\\")}{path}'
+        encoding = self.get_tar_encoding()
+        if encoding is not None:
+            self.handle_tar(save_dir, encoding)
+            return
         content_length = self.get_content_length()
         if not content_length:
             self.respond_bad_request()
@@ -193,22 +497,34 @@ class BaseHandler(BaseHTTPRequestHandler):
         if not boundary:
             self.respond_bad_request()
             return
+        if not self.check_upload(save_dir, content_length):
+            return
+        self.send_continue()
+        start = time.perf_counter()
+        parser = MultipartParser(self.rfile, boundary, content_length, self.get_socket_buffer())
         try:
             os.makedirs(save_dir, exist_ok=True)
             save_dir = save_dir.rstrip('/\\')
-            for mf in MultipartParser(self.rfile, boundary, content_length):
+            for mf in parser:
                 if mf.name != 'file':
                     self.respond_bad_request()
                     return
-                with open(f'{save_dir}/{mf.filename}', 'wb') as f:
-                    mf.transfer_to(f)
+                with self.receive_file(f'{save_dir}/{mf.filename}', 0, mf.digests) as w:
+                    mf.transfer_to(w)
         except MultipartError:
             self.respond_bad_request()
+        except DigestMismatchError as e:
+            self.respond_digest_mismatch(mf.filename, e.digests)
         except PermissionError:
             self.respond_forbidden()
         except (FileExistsError, IsADirectoryError):
             self.respond_internal_server_error()
+        except (ConnectionError, TimeoutError):
+            raise
+        except OSError as e:
+            self.respond_write_error(e)
         else:
+            self.record_upload(parser.read_length, start)
             if self.get_accept_content_type() == 'text/plain':
                 self.respond(HTTPStatus.OK, content_length='0')
             else:
@@ -216,31 +532,250 @@ class BaseHandler(BaseHTTPRequestHandler):
 
     def handle_putfile(self, file_path):
         if file_path.endswith('/'):
-            self.respond_bad_request()
+            encoding = self.get_tar_encoding()
+            if encoding is None:
+                self.respond_bad_request()
+            else:
+                self.handle_tar(file_path, encoding)
             return
         content_length = self.get_content_length()
         if not content_length:
             self.respond_bad_request()
             return
+        if os.path.isdir(file_path):
+            self.respond_conflict()
+            return
+        digests = parse_digests(self.headers.items())
+        try:
+            replaced = 0 if digests else os.path.getsize(file_path)
+        except OSError:
+            replaced = 0
+        if not self.check_upload(os.path.dirname(file_path), content_length, replaced):
+            return
+        if 'sha-256' in digests:
+            status = self.dedupe_upload(file_path, content_length, digests['sha-256'])
+            if status:
+                self.respond(status, connection='close')
+                return
+        self.send_continue()
+        start, size = time.perf_counter(), content_length
         try:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'wb') as f:
+            buffer = self.get_socket_buffer()
+            with self.receive_file(file_path, size, digests) as w:
                 while content_length:
-                    l = min(content_length, 65536)
-                    f.write(self.rfile.read(l))
-                    content_length -= l
+                    n = self.rfile.readinto(buffer[: min(content_length, len(buffer))])
+                    if not n:
+                        raise EOFError
+                    w.write(buffer[:n])
+                    content_length -= n
+        except DigestMismatchError as e:
+            self.respond_digest_mismatch(os.path.basename(file_path), e.digests)
         except PermissionError:
             self.respond_forbidden()
         except (FileExistsError, IsADirectoryError):
             self.respond_internal_server_error()
+        except (ConnectionError, TimeoutError):
+            raise
+        except OSError as e:
+            self.respond_write_error(e)
         else:
+            self.record_upload(size, start)
             self.respond(HTTPStatus.CREATED, content_length='0')
 
+    def get_tar_encoding(self):
+        content_type = self.headers.get('Content-Type', '').partition(';')[0].strip().lower()
+        if content_type in ('application/zstd', 'application/x-zstd'):
+            return 'zstd'
+        if content_type in ('application/x-tar', 'application/tar'):
+            return self.headers.get('Content-Encoding', 'identity').strip().lower()
+        return None
+
+    def handle_tar(self, save_dir, encoding):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            content_length = 0
+        else:
+            content_length = self.get_content_length()
+            if not content_length:
+                self.respond_bad_request()
+                return
+        if encoding not in ('identity', 'zstd') or encoding == 'zstd' and not self._zstd:
+            self.respond_unsupported_media_type()
+            return
+        if not self.check_upload(save_dir, content_length):
+            return
+        self.send_continue()
+        start = time.perf_counter()
+        if content_length:
+            body = BodyReader(self.rfile, content_length)
+        else:
+            body = ChunkedBodyReader(self.rfile)
+        save_dir = save_dir.rstrip('/\\')
+        errors = (tarfile.TarError, self._zstd.error) if self._zstd else tarfile.TarError
+        created, replaced = get_missing_dirs(save_dir), []
+        try:
+            try:
+                os.makedirs(save_dir, exist_ok=True)
+                reader = self._zstd.get_reader(body) if encoding == 'zstd' else body
+                with reader, tarfile.open(None, 'r|', reader, 65536) as tar:
+                    self.extract_tar(tar, save_dir, created, replaced)
+            except BaseException:
+                undo_extraction(created, replaced)
+                raise
+        except (tarfile.FilterError, ChunkedBodyError):
+            self.respond_bad_request()
+        except errors:
+            self.respond_bad_request()
+        except UploadTooLargeError:
+            self.respond_content_too_large()
+        except PermissionError:
+            self.respond_forbidden()
+        except (ConnectionError, TimeoutError):
+            raise
+        except OSError as e:
+            self.respond_write_error(e)
+        else:
+            remove_paths(backup for backup, _ in replaced)
+            self.record_upload(body.size, start)
+            self.respond(
+                HTTPStatus.CREATED, content_length='0', connection=None if body.done else 'close'
+            )
+
+    def extract_tar(self, tar, save_dir, created, replaced):
+        url_path = self.path_only.rstrip('/')
+        root = os.path.realpath(self._dir)
+        extracted = 0
+        for member in tar:
+            name = os.path.normpath('/' + member.name.lstrip('/\\')).replace('\\', '/')
+            parent, base = os.path.split(f'{save_dir}{name}')
+            dest = os.path.join(os.path.realpath(parent), base)
+            url = get_real_url(root, parent)
+            if url is not None and base:
+                url = f'{url.rstrip("/")}/{base}'
+            suffix = '/' if member.isdir() and not name.endswith('/') else ''
+            if (
+                url is None
+                or not self.can_upload_to(f'{url_path}{name}{suffix}')
+                or not self.can_upload_to(f'{url}{suffix}')
+            ):
+                raise PermissionError(member.name)
+            if member.issym():
+                link = get_real_url(root, os.path.join(parent, member.linkname))
+            elif member.islnk():
+                link = get_real_url(root, os.path.join(save_dir, member.linkname))
+            else:
+                link = ''
+            if link is None or link and not self.can_read(link):
+                raise PermissionError(member.name)
+            extracted += member.size
+            if self.max_upload_size and extracted > self.max_upload_size:
+                raise UploadTooLargeError(member.name)
+            created.extend(get_missing_dirs(os.path.dirname(dest)))
+            try:
+                st = os.lstat(dest)
+            except FileNotFoundError:
+                created.append(dest)
+            else:
+                if not member.isdir() and not stat.S_ISDIR(st.st_mode):
+                    backup = get_staging_path(dest)
+                    os.rename(dest, backup)
+                    replaced.append((backup, dest))
+            tar.extract(member, save_dir, filter='data')
+
+    def can_upload_to(self, url):
+        return self.is_url_valid(url) and self.can_access(self.command, url)
+
+    def can_read(self, url):
+        return self.is_url_valid(url) and self.can_access('GET', url)
+
+    def check_upload(self, save_dir, content_length, replaced=0):
+        if self.max_upload_size and content_length > self.max_upload_size:
+            self.respond_content_too_large()
+            return False
+        existing = save_dir
+        while not os.path.isdir(existing):
+            if os.path.lexists(existing):
+                self.respond_conflict()
+                return False
+            parent = os.path.dirname(existing)
+            if parent == existing:
+                break
+            existing = parent
+        if not os.access(existing, os.W_OK | os.X_OK):
+            self.respond_forbidden()
+            return False
+        try:
+            free = shutil.disk_usage(existing).free
+        except OSError:
+            free = None
+        if free is not None and free + replaced < content_length:
+            self.respond_insufficient_storage()
+            return False
+        return True
+
+    def get_file_digest(self, file, f, st):
+        digest = self.hash_index.get(st) if self.hash_index else None
+        if digest is None:
+            with self.timing('hash'), self.advise(f, st.st_size) as reader:
+                digest = hash_file(reader, self.get_disk_buffer())
+            if self.hash_index:
+                self.hash_index.put(file, f, st, digest)
+        return digest
+
+    def dedupe_upload(self, file_path, size, digest):
+        if not self.hash_index:
+            return None
+        target = self.get_readable_path(file_path) if self.can_read(self.path_only) else None
+        if target:
+            try:
+                with open(target, 'rb', buffering=0) as f:
+                    st = os.fstat(f.fileno())
+                    if st.st_size == size and self.hash_index.get(st) == digest:
+                        return HTTPStatus.NO_CONTENT
+            except OSError:
+                pass
+        for path in self.hash_index.find(digest, size):
+            path = self.get_readable_path(path)
+            if not path:
+                continue
+            staged = None
+            try:
+                with open(path, 'rb', buffering=0) as src:
+                    st = os.fstat(src.fileno())
+                    if st.st_size != size or self.hash_index.get(st) != digest:
+                        continue
+                    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                    staged = get_staging_path(file_path)
+                    with open(staged, 'xb', buffering=0) as dst:
+                        copy_file(src, dst, size, self.get_disk_buffer())
+                        self.hash_index.put(file_path, dst, os.fstat(dst.fileno()), digest)
+                    os.replace(staged, file_path)
+            except (OSError, EOFError):
+                if staged:
+                    with contextlib.suppress(OSError):
+                        os.unlink(staged)
+                continue
+            return HTTPStatus.CREATED
+        return None
+
+    def get_readable_path(self, file_path):
+        return None
+
     def send_response(self, code, message=None):
         self.log_request(code)
         self.send_response_only(code, message)
 
+    def send_response_only(self, code, message=None):
+        self._status = code
+        super().send_response_only(code, message)
+        if self.server_timing and code >= 200 and self._request_start is not None:
+            timings = [f'{k};dur={v * 1000:.3f}' for k, v in self._timings.items()]
+            timings.append(f'total;dur={(time.perf_counter() - self._request_start) * 1000:.3f}')
+            self.send_header('Server-Timing', ', '.join(timings))
+
     def send_error(self, code, message=None, explain=None):
+        if self.stats:
+            self.stats.add('errors')
         command = self.command if self.command else '???'
         if message is None:
             if code in self.responses:
@@ -359,9 +894,12 @@ class BaseHandler(BaseHTTPRequestHandler):
         accept_ranges=None,
         content_range=None,
         content_disposition=None,
+        digest=None,
+        digests=None,
         location=None,
         cookie=None,
         connection=None,
+        body=None,
     ):
         self.send_response(status)
         if content_type is not None:
@@ -377,18 +915,35 @@ class BaseHandler(BaseHTTPRequestHandler):
             self.send_header('Transfer-Encoding', transfer_encoding)
         if content_encoding is not None:
             self.send_header('Content-Encoding', content_encoding)
+            self._content_encoding = content_encoding
         if accept_ranges is not None:
             self.send_header('Accept-Ranges', accept_ranges)
         if content_range is not None:
             self.send_header('Content-Range', content_range)
         if content_disposition is not None:
             self.send_header('Content-Disposition', content_disposition)
+        if digest is not None:
+            digest = base64.b64encode(digest).decode()
+            self.send_header('Repr-Digest', f'sha-256=:{digest}:')
+            self.send_header('Digest', f'SHA-256={digest}')
+        if digests is not None:
+            self.send_header('Repr-Digest', format_digests(digests))
         if location is not None:
             self.send_header('Location', location)
         if cookie is not None:
             self.send_header('Set-Cookie', cookie)
         if connection is not None:
             self.send_header('Connection', connection)
+        if self.command == 'HEAD':
+            self.end_headers()
+            return
+        if body is not None:
+            self._headers_buffer.append(b'\r\n')
+            self._headers_buffer.append(body)
+            self.flush_headers()
+            return
+        if content_length != '0' and hasattr(socket, 'TCP_CORK'):
+            self._set_cork(True)
         self.end_headers()
 
     def respond_redirect(self, location, cookie=None, connection=None):
@@ -428,12 +983,51 @@ class BaseHandler(BaseHTTPRequestHandler):
     def respond_method_not_allowed(self):
         self.send_error(HTTPStatus.METHOD_NOT_ALLOWED)
 
+    def respond_conflict(self):
+        self.send_error(HTTPStatus.CONFLICT)
+
+    def respond_content_too_large(self):
+        self.send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+    def respond_insufficient_storage(self):
+        self.send_error(HTTPStatus.INSUFFICIENT_STORAGE)
+
     def respond_internal_server_error(self):
         self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR)
 
+    def respond_digest_mismatch(self, name, digests):
+        if self.stats:
+            self.stats.add('errors')
+        body = f'{name}: {format_digests(digests)}\n'.encode()
+        self.log_error(f'{self.command} digest mismatch {name}: {format_digests(digests)}')
+        self.respond(
+            HTTPStatus.BAD_REQUEST,
+            content_type='text/plain; charset=utf-8',
+            content_length=len(body),
+            digests=digests,
+            connection='close',
+            body=body,
+        )
+
+    def respond_unsupported_media_type(self):
+        self.send_error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE)
+
+    def respond_service_unavailable(self):
+        self.send_error(HTTPStatus.SERVICE_UNAVAILABLE)
+
+    def respond_write_error(self, e):
+        self.log_error(f'{type(e).__name__}: {e}')
+        if e.errno in (errno.ENOSPC, errno.EDQUOT):
+            self.respond_insufficient_storage()
+        else:
+            self.respond_internal_server_error()
+
     def respond_with_data(self, data, content_type, last_modified=None):
         if len(data) >= 1024 and 'zstd' in self.get_accept_encodings() and self._zstd:
-            data = self._zstd.compress(data)
+            self.record('share_zstd_input_bytes_total', len(data), source='data')
+            with self.timing('compress'):
+                data = self._zstd.compress(data)
+            self.record('share_zstd_output_bytes_total', len(data), source='data')
             content_length = len(data)
             content_encoding = 'zstd'
         else:
@@ -445,8 +1039,11 @@ class BaseHandler(BaseHTTPRequestHandler):
             content_length=content_length,
             last_modified=last_modified,
             content_encoding=content_encoding,
+            body=data,
         )
-        self.wfile.write(data)
+
+    def respond_with_headers(self, content_type, last_modified=None):
+        self.respond(HTTPStatus.OK, content_type=content_type, last_modified=last_modified)
 
     def respond_with_html(self, html, last_modified=None):
         self.respond_with_data(html.encode(), 'text/html; charset=utf-8', last_modified)
@@ -461,7 +1058,8 @@ class BaseHandler(BaseHTTPRequestHandler):
             content_type = 'image/x-icon'
         else:
             filename = os.path.basename(file)
-            filesize = os.path.getsize(file)
+            with self.timing('stat'):
+                filesize = os.path.getsize(file)
             content_type = self._guess_type(file)
         request_range = self.headers['Range']
         if request_range:
@@ -480,11 +1078,13 @@ class BaseHandler(BaseHTTPRequestHandler):
             content_range = None
         if file == 'favicon.ico':
             f = io.BytesIO(self.ico)
+            st = None
             last_modified = self.start_time
         else:
             try:
-                f = open(file, 'rb')
-                last_modified = time.gmtime(os.fstat(f.fileno()).st_mtime)
+                f = open(file, 'rb', buffering=0)
+                st = os.fstat(f.fileno())
+                last_modified = time.gmtime(st.st_mtime)
             except PermissionError:
                 self.respond_forbidden()
                 return
@@ -517,6 +1117,13 @@ class BaseHandler(BaseHTTPRequestHandler):
                 content_disposition = f'attachment; filename="{parse.quote(filename)}"'
             else:
                 content_disposition = None
+            digest = hasher = None
+            if self.hash_index and st and not compress:
+                digest = self.hash_index.get(st)
+                if digest is None and status == HTTPStatus.OK and self.command != 'HEAD':
+                    hasher = hashlib.sha256()
+                elif digest is None:
+                    self.hash_index.request(file)
             self.respond(
                 status,
                 content_type=content_type,
@@ -527,21 +1134,111 @@ class BaseHandler(BaseHTTPRequestHandler):
                 accept_ranges=accept_ranges,
                 content_range=content_range,
                 content_disposition=content_disposition,
+                digest=digest,
             )
+            if self.command == 'HEAD':
+                return
             if start:
                 f.seek(start)
             if compress:
-                with ChunkWriter(self.wfile) as writer:
-                    with self._zstd.get_writer(writer) as w:
-                        self.copy_stream(f, w, filesize)
+                regions = get_data_regions(f.fileno(), st) if st else None
+                with self.timing('compress'), ChunkWriter(self.wfile, self.chunk_size) as writer:
+                    with self._zstd.get_writer(writer) as w, self.advise(f, filesize) as reader:
+                        self.copy_stream(reader, w, filesize, regions)
+                self.record('share_zstd_input_bytes_total', filesize, source='file')
+                self.record('share_zstd_output_bytes_total', writer.size, source='file')
+            elif st:
+                with self.timing('body'), self.advise(f, content_length) as reader:
+                    self.copy_stream(reader, self.wfile, content_length, digest=hasher)
+                if hasher:
+                    self.hash_index.put(file, f, st, hasher.digest())
             else:
-                self.copy_stream(f, self.wfile, content_length)
+                with self.timing('body'):
+                    self.copy_stream(f, self.wfile, content_length)
+
+    def respond_with_blocks(self, file):
+        try:
+            block_size = parse_size(self.queries['blocks'] or str(self.block_size))
+        except ValueError:
+            block_size = 0
+        if not 1024 <= block_size <= 67108864:
+            self.respond_bad_request()
+            return
+        try:
+            f = open(file, 'rb', buffering=0)
+        except PermissionError:
+            self.respond_forbidden()
+            return
+        except FileNotFoundError:
+            self.respond_not_found()
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, block_size)
+            data = self.block_cache.get(key)
+            if data is None and self.command == 'HEAD':
+                self.respond(
+                    HTTPStatus.OK,
+                    content_type='text/plain; charset=utf-8',
+                    last_modified=time.gmtime(st.st_mtime),
+                )
+                return
+            if data is None:
+                with self.timing('checksum'), self.advise(f, st.st_size) as reader:
+                    data = get_block_checksums(reader, st.st_size, block_size)
+                self.block_cache.put(key, data)
+        self.respond_with_data(data, 'text/plain; charset=utf-8', time.gmtime(st.st_mtime))
+
+    def respond_with_hash(self, file):
+        try:
+            f = open(file, 'rb', buffering=0)
+        except PermissionError:
+            self.respond_forbidden()
+            return
+        except FileNotFoundError:
+            self.respond_not_found()
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            if self.command == 'HEAD':
+                self.respond(
+                    HTTPStatus.OK,
+                    content_type='text/plain; charset=utf-8',
+                    last_modified=time.gmtime(st.st_mtime),
+                    digest=self.hash_index.get(st) if self.hash_index else None,
+                )
+                return
+            digest = self.get_file_digest(file, f, st)
+        self.respond_with_text(
+            f'{digest.hex()}  {os.path.basename(file)}\n', time.gmtime(st.st_mtime)
+        )
 
-    def copy_stream(self, reader, writer, size):
+    def copy_stream(self, reader, writer, size, regions=None, digest=None):
+        if regions is not None:
+            offset = 0
+            for start, length in regions:
+                self.write_zeros(writer, start - offset)
+                reader.seek(start)
+                self.copy_stream(reader, writer, length)
+                offset = start + length
+            self.write_zeros(writer, size - offset)
+            return
+        buffer = self.get_disk_buffer()
         while size:
-            l = min(size, 65536)
-            writer.write(reader.read(l))
-            size -= l
+            n = reader.readinto(buffer[: min(size, len(buffer))])
+            if not n:
+                raise EOFError
+            if digest:
+                digest.update(buffer[:n])
+            writer.write(buffer[:n])
+            size -= n
+
+    def write_zeros(self, writer, size):
+        zeros = memoryview(bytes(min(size, self.disk_io_size)))
+        while size > 0:
+            n = min(size, len(zeros))
+            writer.write(zeros[:n])
+            size -= n
 
     def log_request(self, code, size=None):
         self.log_message('%s %d %s', self.command, code, parse.unquote(self.path))
@@ -557,6 +1254,8 @@ class BaseHandler(BaseHTTPRequestHandler):
 
 class BaseFileShareHandler(BaseHandler):
 
+    selectable = False
+
     def __init__(self, *args, upload=False, **kwargs):
         self._upload = upload
         if is_windows():
@@ -565,7 +1264,9 @@ class BaseFileShareHandler(BaseHandler):
             self.is_hidden = self._is_hidden_unix
         super().__init__(*args, **kwargs)
 
-    def respond_with_archive(self, dir_path, send_content_disposition=False):
+    def respond_with_archive(
+        self, dir_path, send_content_disposition=False, paths=None, archive_filter=None
+    ):
         if not self._zstd:
             self.respond_not_found()
             return
@@ -583,42 +1284,204 @@ class BaseFileShareHandler(BaseHandler):
             transfer_encoding='chunked',
             content_disposition=content_disposition,
         )
-        with ChunkWriter(self.wfile) as writer:
+        if self.command == 'HEAD':
+            return
+        start = time.perf_counter()
+        with self.timing('archive'), ChunkWriter(self.wfile, self.chunk_size) as writer:
             with self._zstd.get_writer(writer) as w:
                 with tarfile.open(None, 'w|', w, 65536) as tar:
                     url_path = self.path_only.removesuffix('.tar.zst').rstrip('/')
-                    self.archive_folder(dir_path, url_path, '', tar)
-
-    def archive_folder(self, dir_path, url_path, arcname, tar):
-        with os.scandir(dir_path) as it:
-            for entry in it:
+                    groups = [('', None)] if paths is None else self._group_paths(paths)
+                    for parent, names in groups:
+                        parent_url = f'{url_path}/{parent}'.rstrip('/')
+                        if not self.is_url_valid(f'{parent_url}/'):
+                            continue
+                        self.archive_folder(
+                            os.path.join(dir_path, parent),
+                            parent_url,
+                            f'{parent}/' if parent else '',
+                            tar,
+                            self.can_access_all('GET', f'{parent_url}/'),
+                            names,
+                            archive_filter,
+                        )
+        self.record('share_archive_duration_seconds', time.perf_counter() - start)
+        self.record('share_zstd_input_bytes_total', tar.offset, source='archive')
+        self.record('share_zstd_output_bytes_total', writer.size, source='archive')
+
+    def archive_folder(
+        self, dir_path, url_path, arcname, tar, allowed=False, names=None, archive_filter=None
+    ):
+        users, groups = {}, {}
+        matched = archive_filter is None or archive_filter.includes_all
+        stack = [(dir_path, url_path, arcname, allowed, names, matched)]
+        while stack:
+            dir_path, url_path, arcname, allowed, names, matched = stack.pop()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            subdirs = []
+            for entry in entries:
+                if names is not None and entry.name not in names:
+                    continue
                 try:
-                    if entry.is_dir():
+                    if not self.file_filter(entry.path):
+                        continue
+                    is_dir = entry.is_dir()
+                    if is_dir:
                         url_name = f'{entry.name}/'
                     else:
                         url_name = entry.name
-                    if not self.file_filter(entry.path):
+                    if not allowed and not self.can_access('GET', f'{url_path}/{url_name}'):
                         continue
-                    if not self.can_access('GET', f'{url_path}/{url_name}'):
+                    name = f'{arcname}{entry.name}'
+                    if archive_filter and archive_filter.excludes(name):
                         continue
-                    arcname = f'{arcname}/{entry.name}'
-                    tarinfo = tar.gettarinfo(entry.path, arcname)
+                    included = matched or archive_filter.includes(name)
+                    if not included and not is_dir:
+                        continue
+                    tarinfo = self._get_tarinfo(entry, name, tar.inodes, users, groups)
                     if not tarinfo:
                         continue
-                    if tarinfo.isdir():
-                        tar.addfile(tarinfo)
-                        self.archive_folder(entry.path, f'{url_path}/{entry.name}', arcname, tar)
-                    elif tarinfo.isfile():
-                        with open(entry.path, 'rb') as f:
-                            tar.addfile(tarinfo, f)
+                    if included and tarinfo.isreg():
+                        f = open(entry.path, 'rb')
+                        st = entry.stat(follow_symlinks=False)
+                        if st.st_nlink > 1 and st.st_ino:
+                            tar.inodes[(st.st_ino, st.st_dev)] = name
                     else:
-                        tar.addfile(tarinfo)
-                except (PermissionError, FileNotFoundError):
-                    pass
+                        f = None
+                except OSError:
+                    continue
+                if f:
+                    with f, self.advise(f, tarinfo.size) as reader:
+                        regions = get_data_regions(f.fileno(), entry.stat(follow_symlinks=False))
+                        if regions is None:
+                            tar.addfile(tarinfo, reader)
+                        else:
+                            reader = SparseReader(reader, regions, tarinfo.size)
+                            dir_name, _, base_name = tarinfo.name.rpartition('/')
+                            tarinfo.pax_headers = {
+                                'GNU.sparse.major': '1',
+                                'GNU.sparse.minor': '0',
+                                'GNU.sparse.name': tarinfo.name,
+                                'GNU.sparse.realsize': str(tarinfo.size),
+                            }
+                            tarinfo.name = f'{dir_name}/GNUSparseFile.0/{base_name}'.lstrip('/')
+                            tarinfo.size = reader.size
+                            tar.addfile(tarinfo, reader)
+                elif included:
+                    tar.addfile(tarinfo)
+                if tarinfo.isdir():
+                    subdirs.append(
+                        (
+                            entry.path,
+                            f'{url_path}/{entry.name}',
+                            f'{name}/',
+                            allowed or self.can_access_all('GET', f'{url_path}/{url_name}'),
+                            None,
+                            included,
+                        )
+                    )
+            tar.members.clear()
+            stack.extend(reversed(subdirs))
+
+    def _group_paths(self, paths):
+        selected = set()
+        for path in paths:
+            parts = []
+            for p in path.split('/'):
+                if p == '..':
+                    if parts:
+                        parts.pop()
+                elif p and p != '.':
+                    parts.append(p)
+            if not parts:
+                return [('', None)]
+            selected.add(tuple(parts))
+        groups = {}
+        for parts in sorted(selected):
+            if any(parts[:i] in selected for i in range(1, len(parts))):
+                continue
+            groups.setdefault('/'.join(parts[:-1]), set()).add(parts[-1])
+        return sorted(groups.items())
+
+    def _get_tarinfo(self, entry, name, inodes, users, groups):
+        st = entry.stat(follow_symlinks=False)
+        tarinfo = tarfile.TarInfo(name)
+        mode = st.st_mode
+        if stat.S_ISREG(mode):
+            inode = (st.st_ino, st.st_dev)
+            if st.st_nlink > 1 and inode in inodes and name != inodes[inode]:
+                tarinfo.type = tarfile.LNKTYPE
+                tarinfo.linkname = inodes[inode]
+            else:
+                tarinfo.size = st.st_size
+        elif stat.S_ISDIR(mode):
+            tarinfo.type = tarfile.DIRTYPE
+        elif stat.S_ISLNK(mode):
+            tarinfo.type = tarfile.SYMTYPE
+            tarinfo.linkname = os.readlink(entry.path)
+        elif stat.S_ISFIFO(mode):
+            tarinfo.type = tarfile.FIFOTYPE
+        elif stat.S_ISCHR(mode) or stat.S_ISBLK(mode):
+            tarinfo.type = tarfile.CHRTYPE if stat.S_ISCHR(mode) else tarfile.BLKTYPE
+            tarinfo.devmajor = os.major(st.st_rdev)
+            tarinfo.devminor = os.minor(st.st_rdev)
+        else:
+            return None
+        tarinfo.mode = mode
+        tarinfo.uid = st.st_uid
+        tarinfo.gid = st.st_gid
+        tarinfo.mtime = int(st.st_mtime)
+        if pwd:
+            if st.st_uid not in users:
+                try:
+                    users[st.st_uid] = pwd.getpwuid(st.st_uid).pw_name
+                except KeyError:
+                    users[st.st_uid] = ''
+            tarinfo.uname = users[st.st_uid]
+        if grp:
+            if st.st_gid not in groups:
+                try:
+                    groups[st.st_gid] = grp.getgrgid(st.st_gid).gr_name
+                except KeyError:
+                    groups[st.st_gid] = ''
+            tarinfo.gname = groups[st.st_gid]
+        return tarinfo
 
     def file_filter(self, file_path):
         raise NotImplementedError
 
+    def respond_with_shared_file(self, file, send_content_disposition=False):
+        if 'blocks' in self.queries:
+            self.respond_with_blocks(file)
+        elif 'hash' in self.queries:
+            self.respond_with_hash(file)
+        else:
+            self.respond_with_file(file, send_content_disposition)
+
+    def get_search_query(self):
+        return parse.parse_qs(parse.urlsplit(self.path).query).get('search', [''])[0]
+
+    def respond_with_listing(self, dirs, files, last_modified=None):
+        if self.command == 'HEAD':
+            if self.get_accept_content_type() == 'text/plain':
+                content_type = 'text/plain; charset=utf-8'
+            else:
+                content_type = 'text/html; charset=utf-8'
+            self.respond_with_headers(content_type, last_modified)
+            return
+        if self.get_accept_content_type() == 'text/plain':
+            with self.timing('render'):
+                text = self.build_text(dirs, files)
+            self.respond_with_text(text, last_modified)
+        else:
+            with self.timing('render'):
+                html = self.build_html(dirs, files)
+            self.respond_with_html(html, last_modified)
+
     def build_text(self, dirs, files):
         lst = []
         for d in dirs:
@@ -669,14 +1532,22 @@ class BaseFileShareHandler(BaseHandler):
         builder.append('a:hover{text-decoration: underline;}')
         builder.append('.btn-download{display: block; height: 20px; margin-left: 8px;}')
         builder.append('.btn-download:hover{background-color: #e6e6e6; border-radius: 50%;}')
-        if self._upload:
+        if self._upload or self.selectable:
+            builder.append('.actions{display: flex; gap: 8px;}')
+            builder.append(
+                '.action{cursor: pointer; background-color: #76797b; border: 1px solid #76797b; color: white; border-radius: 16px;}'
+            )
+            builder.append('.action:hover{background-color: #565e64; border-color: #565e64;}')
             builder.append(
-                '.upload{cursor: pointer; background-color: #76797b; border: 1px solid #76797b; color: white; border-radius: 16px;}'
+                '.action:disabled{opacity: .65; pointer-events: none; user-select: none;}'
             )
-            builder.append('.upload:hover{background-color: #565e64; border-color: #565e64;}')
+        if self.selectable:
+            builder.append('.select{flex: none; margin-left: 8px;}')
+        if self.search_index:
             builder.append(
-                '.upload:disabled{opacity: .65; pointer-events: none; user-select: none;}'
+                '.search{padding: 0 8px; border: 1px solid #76797b; border-radius: 16px;}'
             )
+        if self._upload:
             builder.append('@media (prefers-color-scheme: light) {')
             builder.append('.dragging{border: 4px dashed #cccccc; border-radius: 4px;}')
             builder.append('}')
@@ -740,6 +1611,17 @@ function on_load() {
 }
 
 window.onload = on_load;
+'''
+            )
+            builder.end_script()
+        if self.selectable:
+            builder.start_script()
+            builder.append(
+                '''
+function on_select() {
+    let archive = document.getElementById("archive");
+    archive.disabled = document.querySelector(".select:checked") === null;
+}
 '''
             )
             builder.end_script()
@@ -755,13 +1637,30 @@ window.onload = on_load;
                 p = f'{p}/{name}'
                 builder.append(f'&nbsp;/&nbsp;<a href="{parse.quote(p)}/">{html.escape(name)}</a>')
         builder.append('</div>')
+        if self._upload or self.selectable:
+            builder.append('<div class="actions">')
+        if self.search_index:
+            builder.append(f'<form action="{parse.quote(self.path_only)}" method="get">')
+            builder.append(
+                f'<input class="search" type="search" name="search" placeholder="Search" value="{html.escape(self.get_search_query())}">'
+            )
+            builder.append('</form>')
+        if self.selectable:
+            builder.append(
+                '<button id="archive" class="action" form="selection" title="Download the selected items as an archive" disabled>Archive</button>'
+            )
+            builder.append(
+                f'<form id="selection" action="{parse.quote(self.path_only)}?archive" method="post" style="display: none;"></form>'
+            )
         if self._upload:
-            builder.append('<button id="upload" class="upload">Upload</button>')
+            builder.append('<button id="upload" class="action">Upload</button>')
             builder.append(
                 f'<form id="form" action="{parse.quote(self.path_only)}" method="post" enctype="multipart/form-data" style="display: none;">'
             )
             builder.append('<input id="file" name="file" type="file" required multiple>')
             builder.append('</form>')
+        if self._upload or self.selectable:
+            builder.append('</div>')
         builder.append('</div>')
         builder.append('<hr>')
         builder.append('<div class="main">')
@@ -786,6 +1685,10 @@ window.onload = on_load;
                 '<svg xmlns="http://www.w3.org/2000/svg" height="20" width="20" fill="#0b57d0"><path d="M4.208 17.5q-.687 0-1.198-.5-.51-.5-.51-1.188V5.438q0-.334.115-.573.114-.24.281-.469L4.062 3q.167-.229.417-.365.25-.135.542-.135h9.958q.292 0 .542.135.25.136.437.365l1.167 1.396q.167.229.271.469.104.239.104.573v10.374q0 .688-.5 1.188t-1.188.5Zm.375-12.438h10.855l-.709-.812H5.292ZM4.25 15.75h11.5V6.812H4.25v8.938ZM10 14.396q.167 0 .333-.073.167-.073.292-.198l2.104-2.104q.25-.25.25-.604 0-.355-.25-.605t-.604-.25q-.354 0-.604.25l-.646.646v-2.5q0-.354-.26-.614-.261-.261-.615-.261t-.615.261q-.26.26-.26.614v2.5l-.646-.646q-.25-.25-.604-.25t-.604.25q-.25.25-.25.605 0 .354.25.604l2.104 2.104q.125.125.292.198.166.073.333.073ZM4.25 15.75V6.812v8.938Z"/></svg>'
             )
             builder.append('</a>')
+            if self.selectable:
+                builder.append(
+                    f'<input class="select" type="checkbox" name="path" value="{html.escape(d.name)}" form="selection" onchange="on_select()">'
+                )
             builder.append('</span>')
             builder.append('</li>')
         for f in files:
@@ -808,6 +1711,10 @@ window.onload = on_load;
                 '<svg xmlns="http://www.w3.org/2000/svg" enable-background="new 0 0 24 24" height="20px" viewBox="0 0 24 24" width="20px" fill="#0b57d0"><g><path d="M18,15v3H6v-3H4v3c0,1.1,0.9,2,2,2h12c1.1,0,2-0.9,2-2v-3H18z M17,11l-1.41-1.41L13,12.17V4h-2v8.17L8.41,9.59L7,11l5,5 L17,11z"/></g></svg>'
             )
             builder.append('</a>')
+            if self.selectable:
+                builder.append(
+                    f'<input class="select" type="checkbox" name="path" value="{html.escape(f.name)}" form="selection" onchange="on_select()">'
+                )
             builder.append('</span>')
             builder.append('</li>')
         builder.append('</ul>')
@@ -863,10 +1770,7 @@ class VirtualTarShareHandler(BaseFileShareHandler):
                 self.respond_not_modified(last_modified)
                 return
             dirs, files = [], [FileItem(self._filename, False, -1)]
-            if self.get_accept_content_type() == 'text/plain':
-                self.respond_with_text(self.build_text(dirs, files), last_modified)
-            else:
-                self.respond_with_html(self.build_html(dirs, files), last_modified)
+            self.respond_with_listing(dirs, files, last_modified)
             return
         name = self.path_only[1:]
         if name == self._filename or name == 'file':
@@ -886,19 +1790,19 @@ class FileShareHandler(BaseFileShareHandler):
 
     def handle_get(self):
         if self.path_only == '/':
+            if self.command == 'HEAD':
+                self.respond_with_listing(None, None)
+                return
             dirs, files = self.list_files()
-            if self.get_accept_content_type() == 'text/plain':
-                self.respond_with_text(self.build_text(dirs, files))
-            else:
-                self.respond_with_html(self.build_html(dirs, files))
+            self.respond_with_listing(dirs, files)
             return
         name = self.path_only[1:]
         file_path = self._find_file(name)
         if file_path:
-            self.respond_with_file(file_path)
+            self.respond_with_shared_file(file_path)
             return
         if len(self._files) == 1 and name == 'file':
-            self.respond_with_file(self._files[0], True)
+            self.respond_with_shared_file(self._files[0], True)
             return
         self.respond_not_found()
 
@@ -909,7 +1813,8 @@ class FileShareHandler(BaseFileShareHandler):
                 files.append(FileItem(os.path.basename(f), self.is_hidden(f), os.path.getsize(f)))
             except Exception:
                 pass
-        return ([], sorted(files))
+        with self.timing('sort'):
+            return ([], sorted(files))
 
     def _find_file(self, name):
         for f in self._files:
@@ -920,6 +1825,9 @@ class FileShareHandler(BaseFileShareHandler):
 
 class DirectoryShareHandler(BaseFileShareHandler):
 
+    selectable = True
+    search_limit = 100
+
     def __init__(self, dir_path, all_files, *args, **kwargs):
         self._dir = dir_path.rstrip('/\\') + '/'
         self._all = all_files
@@ -934,25 +1842,37 @@ class DirectoryShareHandler(BaseFileShareHandler):
             self.respond_not_found()
             return
         full_path = self._dir.rstrip('/') + self.path_only
-        if os.path.isdir(full_path):
+        with self.timing('stat'):
+            is_dir = os.path.isdir(full_path)
+            is_file = not is_dir and os.path.isfile(full_path)
+        if is_dir:
             if not self.path_only.endswith('/'):
                 self.respond_redirect(parse.quote(f'{self.path_only}/'))
                 return
+            if 'archive' in self.queries:
+                self.respond_with_selection(
+                    full_path, parse.parse_qs(parse.urlsplit(self.path).query)
+                )
+                return
+            if self.search_index and self.queries.get('search'):
+                self.respond_with_search(self.get_search_query())
+                return
             try:
-                dirs, files = self.list_dir(full_path)
+                if self.command == 'HEAD':
+                    os.scandir(full_path).close()
+                    dirs = files = None
+                else:
+                    dirs, files = self.list_dir(full_path)
             except PermissionError:
                 self.respond_forbidden()
                 return
             except FileNotFoundError:
                 self.respond_not_found()
                 return
-            if self.get_accept_content_type() == 'text/plain':
-                self.respond_with_text(self.build_text(dirs, files))
-            else:
-                self.respond_with_html(self.build_html(dirs, files))
+            self.respond_with_listing(dirs, files)
             return
-        if os.path.isfile(full_path):
-            self.respond_with_file(full_path)
+        if is_file:
+            self.respond_with_shared_file(full_path)
             return
         if full_path.endswith('.tar.zst'):
             full_path = full_path[:-8]
@@ -964,11 +1884,23 @@ class DirectoryShareHandler(BaseFileShareHandler):
     def is_url_valid(self, path):
         return self._all or not self._contains_hidden_segment(path)
 
+    def get_readable_path(self, file_path):
+        root = os.path.realpath(self._dir)
+        file_path = os.path.realpath(file_path)
+        if not file_path.startswith(os.path.join(root, '')) or not os.path.isfile(file_path):
+            return None
+        url = '/' + os.path.relpath(file_path, root).replace(os.sep, '/')
+        if not self.is_url_valid(url) or not self.file_filter(file_path):
+            return None
+        if not self.can_access('GET', url):
+            return None
+        return file_path
+
     def list_dir(self, dir_path):
         if not dir_path.endswith('/'):
             dir_path = dir_path + '/'
         dirs, files = [], []
-        with os.scandir(dir_path) as it:
+        with self.timing('scan'), os.scandir(dir_path) as it:
             for entry in it:
                 try:
                     if self.file_filter(entry.path):
@@ -982,19 +1914,95 @@ class DirectoryShareHandler(BaseFileShareHandler):
                             )
                 except (PermissionError, FileNotFoundError):
                     pass
-        return (sorted(dirs), sorted(files))
+        with self.timing('sort'):
+            return (sorted(dirs), sorted(files))
+
+    def respond_with_search(self, query):
+        if not self.search_index.ready:
+            self.respond_service_unavailable()
+            return
+        prefix = self.path_only[1:]
+        allowed = self.can_access_all('GET', self.path_only)
+        dirs, files = [], []
+        with self.timing('search'):
+            for path, size in self.search_index.search(query):
+                if not path.startswith(prefix):
+                    continue
+                url = f'/{path}/' if size < 0 else f'/{path}'
+                file_path = self._dir + path
+                if not self.is_url_valid(url) or not self.file_filter(file_path):
+                    continue
+                if not allowed and not self.can_access('GET', url):
+                    continue
+                name = path[len(prefix) :]
+                if size < 0:
+                    dirs.append(FileItem(name, self.is_hidden(file_path), None))
+                else:
+                    files.append(FileItem(name, self.is_hidden(file_path), size))
+                if len(dirs) + len(files) >= self.search_limit:
+                    break
+        self.respond_with_listing(dirs, files)
+
+    def respond_with_selection(self, dir_path, fields):
+        self.respond_with_archive(
+            dir_path,
+            True,
+            fields.get('path'),
+            ArchiveFilter(fields.get('include', []), fields.get('exclude', [])),
+        )
+
+    def handle_archive_form(self):
+        if not self.is_url_valid(self.path_only):
+            self.respond_not_found()
+            return
+        full_path = self._dir.rstrip('/') + self.path_only
+        if not self.path_only.endswith('/') or not os.path.isdir(full_path):
+            self.respond_not_found()
+            return
+        content_type = self.headers.get('Content-Type', '').partition(';')[0].strip()
+        if content_type != 'application/x-www-form-urlencoded':
+            self.respond_unsupported_media_type()
+            return
+        content_length = self.get_content_length()
+        if content_length is None:
+            self.respond_bad_request()
+            return
+        if content_length > 1048576:
+            self.respond_content_too_large()
+            return
+        self.send_continue()
+        body = self.rfile.read(content_length)
+        self._received_bytes += len(body)
+        if len(body) < content_length:
+            self.respond_bad_request()
+            return
+        try:
+            fields = parse.parse_qs(body.decode())
+        except UnicodeDecodeError:
+            self.respond_bad_request()
+            return
+        self.respond_with_selection(full_path, fields)
+
+    def get_post_method(self):
+        return 'GET' if 'archive' in self.queries else 'POST'
 
     def handle_post(self):
-        if self._upload:
-            self.handle_multipart(self._dir, self.path_only)
-        else:
+        if 'archive' in self.queries:
+            self.handle_archive_form()
+        elif not self._upload:
             super().handle_post()
+        elif not self.is_url_valid(self.path_only):
+            self.respond_forbidden()
+        else:
+            self.handle_multipart(self._dir, self.path_only)
 
     def handle_put(self):
-        if self._upload:
-            self.handle_putfile(self._dir.rstrip('/') + self.path_only)
-        else:
+        if not self._upload:
             super().handle_put()
+        elif not self.is_url_valid(self.path_only):
+            self.respond_forbidden()
+        else:
+            self.handle_putfile(self._dir.rstrip('/') + self.path_only)
 
     def file_filter(self, file_path):
         return self._all or not self.is_hidden(file_path)
@@ -1252,14 +2260,19 @@ window.onload = on_load;
             self.respond_bad_request()
             return
         content_length = self.get_content_length()
-        if not content_length or content_length <= 5 or content_length > 1048576:
+        if not content_length or content_length <= 5:
             self.respond_bad_request()
             return
+        if content_length > 1048576:
+            self.respond_content_too_large()
+            return
+        self.send_continue()
         text = self.rfile.read(5).decode()
         if text != 'text=':
             self.respond_bad_request()
             return
         text = self.rfile.read(content_length - 5).decode()
+        self._received_bytes += content_length
         text = parse.unquote_plus(text)
         if self.get_accept_content_type() == 'text/plain':
             self.respond(HTTPStatus.OK, content_length='0')
@@ -1335,6 +2348,23 @@ class HtmlBuilder:
         return ''.join(self._list)
 
 
+class PhaseTimer:
+
+    def __init__(self, handler, name):
+        self._handler = handler
+        self._name = name
+
+    def __enter__(self):
+        self._handler._timing_active = True
+        self._start = time.perf_counter()
+
+    def __exit__(self, *args):
+        duration = time.perf_counter() - self._start
+        self._handler._timing_active = False
+        timings = self._handler._timings
+        timings[self._name] = timings.get(self._name, 0) + duration
+
+
 class FileItem:
 
     _name_part_pattern = re.compile(r'([0\D]+)|([1-9]\d*)', re.ASCII)
@@ -1395,36 +2425,59 @@ class MultipartFile:
             raise MultipartError
         self.name = match.group(1)
         self.filename = os.path.basename(match.group(2))
+        self.digests = parse_digests(headers.items())
 
 
 class MultipartParser:
 
-    def __init__(self, stream, boundary, content_length):
+    def __init__(self, stream, boundary, content_length, buffer):
         self._stream = stream
         self._total_length = content_length
-        self._read_length = 0
+        self._unread_length = content_length
+        self._buffer = buffer
+        self._data = buffer.obj
+        self._start = 0
+        self._end = 0
         self._separator = f'--{boundary}\r\n'.encode()
-        self._terminator = f'--{boundary}--\r\n'.encode()
+        self._delimiter = f'\r\n--{boundary}'.encode()
         self._terminated = False
 
     def __iter__(self):
-        if self._read_length != 0:
+        if self._start != 0 or self._end != 0:
             raise MultipartError
         if self._read_line() != self._separator:
             raise MultipartError
         while not self._terminated:
             yield MultipartFile(self._read_headers(), self._transfer_to)
-        if self._read_length != self._total_length:
+        if self._unread_length != 0 or self._start != self._end:
             raise MultipartError
 
-    def _read_line(self):
-        if self._read_length >= self._total_length:
+    @property
+    def read_length(self):
+        return self._total_length - self._unread_length
+
+    def _fill(self):
+        if self._start:
+            n = self._end - self._start
+            self._buffer[:n] = self._buffer[self._start : self._end]
+            self._start, self._end = 0, n
+        l = min(self._unread_length, len(self._buffer) - self._end)
+        if not l:
             raise MultipartError
-        l = min(65536, self._total_length - self._read_length)
-        line = self._stream.readline(l)
-        if not line:
+        n = self._stream.readinto(self._buffer[self._end : self._end + l])
+        if not n:
             raise MultipartError
-        self._read_length += len(line)
+        self._end += n
+        self._unread_length -= n
+
+    def _read_line(self):
+        while True:
+            i = self._data.find(b'\n', self._start, self._end)
+            if i != -1:
+                break
+            self._fill()
+        line = bytes(self._buffer[self._start : i + 1])
+        self._start = i + 1
         return line
 
     def _read_headers(self):
@@ -1446,61 +2499,383 @@ class MultipartParser:
         return headers
 
     def _transfer_to(self, out):
-        line, next_line = None, None
+        delimiter = self._delimiter
         while True:
-            if not line:
-                line = self._read_line()
-            if line.endswith(b'\r'):
-                next_line = self._read_line()
-                if next_line != b'\n':
-                    out.write(line)
-                    line = next_line
-                    continue
-                line += next_line
-            if line.endswith(b'\r\n'):
-                next_line = self._read_line()
-                if next_line == self._separator:
-                    if len(line) > 2:
-                        out.write(line[:-2])
-                    return
-                if next_line == self._terminator:
-                    self._terminated = True
-                    if len(line) > 2:
-                        out.write(line[:-2])
-                    return
-                out.write(line)
-                line = next_line
-                continue
-            out.write(line)
-            line = None
+            i = self._data.find(delimiter, self._start, self._end)
+            if i != -1:
+                if i > self._start:
+                    out.write(self._buffer[self._start : i])
+                self._start = i + len(delimiter)
+                break
+            safe_end = self._end - len(delimiter) + 1
+            if safe_end > self._start:
+                out.write(self._buffer[self._start : safe_end])
+                self._start = safe_end
+            self._fill()
+        line = self._read_line()
+        if line == b'--\r\n':
+            self._terminated = True
+        elif line != b'\r\n':
+            raise MultipartError
 
 
 class MultipartError(ValueError):
     pass
 
 
-class ChunkWriter:
+class UploadTooLargeError(ValueError):
+    pass
 
-    def __init__(self, stream):
-        self._stream = stream
-        self._closed = False
 
-    def write(self, data):
-        if not data:
-            return 0
-        self._stream.write(f'{hex(len(data))[2:]}\r\n'.encode())
-        n = self._stream.write(data)
-        self._stream.write(b'\r\n')
+class DigestMismatchError(ValueError):
+
+    def __init__(self, digests):
+        super().__init__(format_digests(digests))
+        self.digests = digests
+
+
+class AdvisedFile:
+
+    drop_step = 8388608
+
+    def __init__(self, file, size, readahead, drop, write=False):
+        self._file = file
+        self._fd = file.fileno()
+        self._readahead = readahead
+        self._drop = drop
+        self._write = write
+        self._offset = file.tell()
+        self._ahead = self._offset
+        self._dropped = self._offset
+        self._mark = self._offset
+        if readahead:
+            os.posix_fadvise(self._fd, self._offset, size, os.POSIX_FADV_SEQUENTIAL)
+        self._advance()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if self._drop and self._offset > self._dropped:
+            self._fadvise(self._dropped, self._offset, os.POSIX_FADV_DONTNEED)
+
+    def read(self, size):
+        data = self._file.read(size)
+        self._offset += len(data)
+        self._advance()
+        return data
+
+    def readinto(self, buffer):
+        n = self._file.readinto(buffer)
+        self._offset += n
+        self._advance()
+        return n
+
+    def write(self, data):
+        n = self._file.write(data)
+        self._offset += n
+        self._advance()
+        return n
+
+    def seek(self, offset):
+        self._offset = self._file.seek(offset)
+        self._advance()
+        return self._offset
+
+    def _advance(self):
+        offset = self._offset
+        if self._readahead and offset + self._readahead // 2 >= self._ahead:
+            self._fadvise(
+                max(offset, self._ahead), offset + self._readahead, os.POSIX_FADV_WILLNEED
+            )
+            self._ahead = offset + self._readahead
+        if self._drop and offset - self._mark >= self.drop_step:
+            if self._write:
+                self._fadvise(self._mark, offset, os.POSIX_FADV_DONTNEED)
+                self._dropped = offset
+            else:
+                self._fadvise(self._dropped, offset, os.POSIX_FADV_DONTNEED)
+                self._dropped = self._mark
+            self._mark = offset
+
+    def _fadvise(self, start, end, advice):
+        try:
+            os.posix_fadvise(self._fd, start, end - start, advice)
+        except OSError:
+            self._readahead = 0
+            self._drop = False
+
+
+class WriteBehind:
+
+    def __init__(self, file, buffer_size, buffers):
+        self._file = file
+        self._buffer_size = buffer_size
+        self._buffers = buffers
+        self._allocated = 1
+        self._free = queue.SimpleQueue()
+        self._queue = queue.SimpleQueue()
+        self._buffer = memoryview(bytearray(buffer_size))
+        self._filled = 0
+        self._thread = None
+        self._error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if self._thread is None:
+            if exc_type is None and self._filled:
+                self._file.write(self._buffer[: self._filled])
+            return
+        if exc_type is None and self._filled:
+            self._queue.put((self._buffer, self._filled))
+        self._queue.put(None)
+        self._thread.join()
+        if exc_type is None and self._error:
+            raise self._error
+
+    def write(self, data):
+        if self._error:
+            raise self._error
+        n = len(data)
+        offset = 0
+        while offset < n:
+            if self._filled == self._buffer_size:
+                self._submit()
+            l = min(n - offset, self._buffer_size - self._filled)
+            self._buffer[self._filled : self._filled + l] = data[offset : offset + l]
+            self._filled += l
+            offset += l
+        return n
+
+    def _submit(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._write_forever, daemon=True)
+            self._thread.start()
+        self._queue.put((self._buffer, self._filled))
+        if self._allocated < self._buffers and self._free.empty():
+            self._allocated += 1
+            self._buffer = memoryview(bytearray(self._buffer_size))
+        else:
+            self._buffer = self._free.get()
+        self._filled = 0
+
+    def _write_forever(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            buffer, n = item
+            if self._error is None:
+                try:
+                    self._file.write(buffer[:n])
+                except OSError as e:
+                    self._error = e
+            self._free.put(buffer)
+
+
+class HashingWriter:
+
+    def __init__(self, file, hashers):
+        self._file = file
+        self._hashers = list(hashers.values())
+
+    def write(self, data):
+        for hasher in self._hashers:
+            hasher.update(data)
+        return self._file.write(data)
+
+
+class SparseReader:
+
+    def __init__(self, file, regions, size):
+        if not regions or sum(regions[-1]) < size:
+            regions = [*regions, (size, 0)]
+        lines = [str(len(regions))]
+        for offset, length in regions:
+            lines.append(str(offset))
+            lines.append(str(length))
+        header = ('\n'.join(lines) + '\n').encode()
+        self._header = header + bytes(-len(header) % tarfile.BLOCKSIZE)
+        self._file = file
+        self._regions = iter(regions)
+        self._remaining = 0
+        self.size = len(self._header) + sum(length for _, length in regions)
+
+    def read(self, size):
+        data, self._header = self._header[:size], self._header[size:]
+        chunks = [data]
+        size -= len(data)
+        while size:
+            if not self._remaining:
+                offset, self._remaining = next(self._regions, (None, None))
+                if offset is None:
+                    break
+                self._file.seek(offset)
+                continue
+            data = self._file.read(min(size, self._remaining))
+            if not data:
+                break
+            chunks.append(data)
+            self._remaining -= len(data)
+            size -= len(data)
+        return b''.join(chunks)
+
+
+class SocketWriter(io.BufferedIOBase):
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._scatter = hasattr(sock, 'sendmsg') and not isinstance(sock, ssl.SSLSocket)
+        self.written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._sock.sendall(data)
+        with memoryview(data) as view:
+            self.written += view.nbytes
+            return view.nbytes
+
+    def writev(self, buffers):
+        if not self._scatter:
+            return self.write(b''.join(buffers))
+        buffers = [memoryview(b) for b in buffers]
+        size = sum(b.nbytes for b in buffers)
+        while buffers:
+            n = self._sock.sendmsg(buffers)
+            while buffers and n >= buffers[0].nbytes:
+                n -= buffers.pop(0).nbytes
+            if n:
+                buffers[0] = buffers[0][n:]
+        self.written += size
+        return size
+
+    def fileno(self):
+        return self._sock.fileno()
+
+
+class BodyReader(io.RawIOBase):
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        self._remaining = length
+        self.size = 0
+
+    @property
+    def done(self):
+        return not self._remaining
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._remaining)
+        if not n:
+            return 0
+        with memoryview(buffer) as view:
+            n = self._stream.readinto(view[:n])
+        if not n:
+            raise EOFError
+        self._remaining -= n
+        self.size += n
+        return n
+
+
+class ChunkedBodyReader(io.RawIOBase):
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._remaining = 0
+        self.size = 0
+        self.done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.done:
+            return 0
+        if not self._remaining:
+            line = self._stream.readline(1024)
+            if not line.endswith(b'\n'):
+                raise ChunkedBodyError
+            try:
+                self._remaining = int(line.partition(b';')[0].strip(), 16)
+            except ValueError:
+                raise ChunkedBodyError
+            if self._remaining < 0:
+                raise ChunkedBodyError
+            if not self._remaining:
+                while self._stream.readline(1024) not in (b'\r\n', b'\n', b''):
+                    pass
+                self.done = True
+                return 0
+        n = min(len(buffer), self._remaining)
+        with memoryview(buffer) as view:
+            n = self._stream.readinto(view[:n])
+        if not n:
+            raise EOFError
+        self._remaining -= n
+        self.size += n
+        if not self._remaining and self._stream.readline(3) not in (b'\r\n', b'\n'):
+            raise ChunkedBodyError
+        return n
+
+
+class ChunkedBodyError(ValueError):
+    pass
+
+
+class ChunkWriter:
+
+    def __init__(self, stream, chunk_size=65536):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._closed = False
+        self.size = 0
+
+    def write(self, data):
+        with memoryview(data) as view:
+            n = view.nbytes
+        if not n:
+            return 0
+        self.size += n
+        if self._buffer:
+            self._buffer += data
+            if len(self._buffer) >= self._chunk_size:
+                self._stream.writev((self._chunk_size_line(self._buffer), self._buffer, b'\r\n'))
+                self._buffer.clear()
+        elif n >= self._chunk_size:
+            self._stream.writev((self._chunk_size_line(data), data, b'\r\n'))
+        else:
+            self._buffer += data
         return n
 
     def flush(self):
+        if self._buffer:
+            self._stream.writev((self._chunk_size_line(self._buffer), self._buffer, b'\r\n'))
+            self._buffer.clear()
         self._stream.flush()
 
     def close(self):
         if self._closed:
             return
         self._closed = True
-        self._stream.write(b'0\r\n\r\n')
+        if self._buffer:
+            self._stream.writev(
+                (self._chunk_size_line(self._buffer), self._buffer, b'\r\n0\r\n\r\n')
+            )
+            self._buffer.clear()
+        else:
+            self._stream.write(b'0\r\n\r\n')
+
+    def _chunk_size_line(self, data):
+        with memoryview(data) as view:
+            return f'{view.nbytes:x}\r\n'.encode()
 
     def __enter__(self):
         return self
@@ -1526,6 +2901,7 @@ class Authenticator:
         if not content_length or content_length > 100:
             handler.respond_bad_request()
             return
+        handler.send_continue()
         data = handler.rfile.read(content_length).decode()
         data = parse.unquote_plus(data)
         password, _, remember_device = data.partition('&')
@@ -1582,31 +2958,612 @@ class AuthRuleMatcher:
         r'^(?P<pattern>[/*].*?)(:(?P<methods>((|GET|POST|PUT),)*(GET|POST|PUT)))?$'
     )
 
-    def __init__(self, rules):
-        self._rules = {}
+    _literal_prefix_pattern = re.compile(r'[^*?\[]*')
+
+    def __init__(self, rules, cache_size=16384):
+        patterns = {}
         for rule in rules:
             match = self._rule_pattern.match(rule)
             if not match:
                 raise InvalidAuthRuleError
-            pattern = re.compile(fnmatch.translate(match.group('pattern')))
+            pattern = match.group('pattern')
             methods = match.group('methods')
             methods = methods if methods else 'GET,POST,PUT'
             for method in methods.split(','):
-                if method in self._rules:
-                    self._rules[method].append(pattern)
+                if method in patterns:
+                    patterns[method].append(pattern)
                 else:
-                    self._rules[method] = [pattern]
+                    patterns[method] = [pattern]
+        self._rules = {}
+        self._prefixes = {}
+        for method, lst in patterns.items():
+            self._rules[method] = re.compile('|'.join(fnmatch.translate(p) for p in lst))
+            self._prefixes[method] = [
+                (
+                    self._literal_prefix_pattern.match(p).group(),
+                    self._literal_prefix_pattern.fullmatch(p) is not None,
+                )
+                for p in lst
+            ]
+        self.match = functools.lru_cache(cache_size)(self._match)
 
-    def match(self, method, path):
-        if method not in self._rules:
+    def _match(self, method, path):
+        rule = self._rules.get(method)
+        if not rule:
             return False
-        if any(rule.match(path) for rule in self._rules[method]):
+        if rule.match(path):
             return True
         if path.endswith('.tar.zst'):
             dir_path = path.removesuffix('.tar.zst').rstrip('/') + '/'
-            return any(rule.match(dir_path) for rule in self._rules[method])
+            return rule.match(dir_path) is not None
         return False
 
+    def match_under(self, method, prefix):
+        for literal, exact in self._prefixes.get(method, ()):
+            if literal.startswith(prefix) or (not exact and prefix.startswith(literal)):
+                return True
+        return False
+
+
+class ArchiveFilter:
+
+    def __init__(self, include, exclude):
+        self._include = self._compile(include)
+        self._exclude = self._compile(exclude)
+        self.includes_all = self._include == (None, None)
+
+    def _compile(self, patterns):
+        paths, names = [], []
+        for pattern in patterns:
+            pattern = pattern.strip('/')
+            if '/' in pattern:
+                paths.append(fnmatch.translate(pattern))
+            elif pattern:
+                names.append(fnmatch.translate(pattern))
+        return (
+            re.compile('|'.join(paths)) if paths else None,
+            re.compile('|'.join(names)) if names else None,
+        )
+
+    def _match(self, rule, name):
+        path_rule, name_rule = rule
+        if path_rule and path_rule.match(name):
+            return True
+        return name_rule is not None and name_rule.match(name.rpartition('/')[2]) is not None
+
+    def includes(self, name):
+        return self.includes_all or self._match(self._include, name)
+
+    def excludes(self, name):
+        return self._match(self._exclude, name)
+
+
+class Metrics:
+
+    # fmt: off
+    types = {
+        'share_requests_total': ('counter', 'Requests handled.'),
+        'share_request_duration_seconds': ('histogram', 'Time spent handling requests.'),
+        'share_sent_bytes_total': ('counter', 'Bytes sent to clients.'),
+        'share_received_bytes_total': ('counter', 'Bytes of request bodies received from clients.'),
+        'share_zstd_input_bytes_total': ('counter', 'Bytes fed into zstd compressors.'),
+        'share_zstd_output_bytes_total': ('counter', 'Bytes produced by zstd compressors.'),
+        'share_archive_duration_seconds': ('histogram', 'Time spent generating archives.'),
+        'share_upload_bytes_total': ('counter', 'Bytes of uploaded files.'),
+        'share_upload_throughput_bytes_per_second': ('histogram', 'Throughput of uploads.'),
+        'share_connections': ('gauge', 'Open connections.'),
+        'share_threads': ('gauge', 'Running threads.'),
+    }
+    buckets = {
+        'share_request_duration_seconds': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+        'share_archive_duration_seconds': (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600),
+        'share_upload_throughput_bytes_per_second': (1e5, 1e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9, 2.5e9, 1e10),
+    }
+    # fmt: on
+    _header = struct.Struct('=QQ')
+    slot_size = 1048576
+
+    def __init__(self, workers=1):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._workers = workers
+        self._worker = None
+        if workers > 1:
+            self._mmap = mmap.mmap(-1, workers * self.slot_size)
+
+    def select(self, worker):
+        self._worker = worker
+        threading.Thread(target=self._publish_forever, daemon=True).start()
+
+    def commit(self, samples):
+        with self._lock:
+            for name, labels, value in samples:
+                key = (name, labels)
+                buckets = self.buckets.get(name)
+                if buckets is None:
+                    self._values[key] = self._values.get(key, 0) + value
+                    continue
+                counts = self._values.get(key)
+                if counts is None:
+                    counts = self._values[key] = [0] * (len(buckets) + 2)
+                for i, bound in enumerate(buckets):
+                    if value <= bound:
+                        counts[i] += 1
+                        break
+                counts[-2] += 1
+                counts[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            values = {k: v.copy() if isinstance(v, list) else v for k, v in self._values.items()}
+        values[('share_threads', ())] = threading.active_count()
+        return values
+
+    def render(self):
+        values = self.snapshot()
+        if self._worker is not None:
+            for worker in range(self._workers):
+                if worker != self._worker:
+                    self._merge(values, self._read(worker))
+        lines = []
+        for name, (kind, description) in self.types.items():
+            keys = sorted(k for k in values if k[0] == name)
+            if not keys:
+                continue
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for key in keys:
+                labels, value = key[1], values[key]
+                if kind != 'histogram':
+                    lines.append(f'{name}{self._format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets[name], value):
+                    cumulative += count
+                    le = self._format_labels((*labels, ('le', str(bound))))
+                    lines.append(f'{name}_bucket{le} {cumulative}')
+                le = self._format_labels((*labels, ('le', '+Inf')))
+                lines.append(f'{name}_bucket{le} {value[-2]}')
+                lines.append(f'{name}_sum{self._format_labels(labels)} {value[-1]}')
+                lines.append(f'{name}_count{self._format_labels(labels)} {value[-2]}')
+        lines.append('')
+        return '\n'.join(lines)
+
+    def _format_labels(self, labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in labels) + '}'
+
+    def _merge(self, values, other):
+        for key, value in other.items():
+            if key not in values:
+                values[key] = value
+            elif isinstance(value, list):
+                values[key] = [a + b for a, b in zip(values[key], value)]
+            else:
+                values[key] += value
+
+    def _publish_forever(self):
+        offset = self._worker * self.slot_size
+        while True:
+            items = [[k[0], k[1], v] for k, v in self.snapshot().items()]
+            data = json.dumps(items).encode()
+            if self._header.size + len(data) <= self.slot_size:
+                seq, _ = self._header.unpack_from(self._mmap, offset)
+                self._header.pack_into(self._mmap, offset, seq + 1, 0)
+                start = offset + self._header.size
+                self._mmap[start : start + len(data)] = data
+                self._header.pack_into(self._mmap, offset, seq + 2, len(data))
+            time.sleep(1)
+
+    def _read(self, worker):
+        offset = worker * self.slot_size
+        for _ in range(3):
+            seq, length = self._header.unpack_from(self._mmap, offset)
+            if seq % 2:
+                continue
+            start = offset + self._header.size
+            data = self._mmap[start : start + length]
+            if self._header.unpack_from(self._mmap, offset)[0] != seq:
+                continue
+            if not data:
+                return {}
+            return {(k, tuple(map(tuple, labels))): v for k, labels, v in json.loads(data)}
+        return {}
+
+
+class AccessLog:
+
+    def __init__(self, path, format='json', max_size=104857600, backups=5):
+        self._path = path
+        self._format = format
+        self._max_size = max_size
+        self._backups = backups
+        self._queue = queue.Queue(10000)
+        self._dropped = 0
+        self._thread = None
+
+    def select(self, worker):
+        root, ext = os.path.splitext(self._path)
+        self._path = f'{root}.{worker}{ext}'
+        self.start()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_forever, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self._dropped += 1
+
+    def close(self):
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(5)
+
+    def _write_forever(self):
+        f = open(self._path, 'ab')
+        size = f.tell()
+        while True:
+            records = [self._queue.get()]
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            data = b''.join(self._format_record(r) for r in records if r is not None)
+            if size and size + len(data) > self._max_size:
+                f.close()
+                self._rotate()
+                f = open(self._path, 'ab')
+                size = 0
+            f.write(data)
+            f.flush()
+            size += len(data)
+            if self._dropped:
+                dropped, self._dropped = self._dropped, 0
+                sys.stderr.write(f'{dropped} access log entries dropped\n')
+            if None in records:
+                f.close()
+                return
+
+    def _rotate(self):
+        for i in range(self._backups - 1, 0, -1):
+            if os.path.exists(f'{self._path}.{i}'):
+                os.replace(f'{self._path}.{i}', f'{self._path}.{i + 1}')
+        if self._backups:
+            os.replace(self._path, f'{self._path}.1')
+        else:
+            os.remove(self._path)
+
+    def _format_record(self, record):
+        if self._format == 'json':
+            t = time.localtime(record['time'])
+            ms = int(record['time'] % 1 * 1000)
+            record['time'] = time.strftime(f'%Y-%m-%dT%H:%M:%S.{ms:03d}%z', t)
+            return f'{json.dumps(record)}\n'.encode()
+        t = time.strftime('%d/%b/%Y:%H:%M:%S %z', time.localtime(record['time']))
+        request = f'{record["method"]} {record["path"]} {record["protocol"]}'
+        line = (
+            f'{record["client"]} - - [{t}] "{request}" {record["status"]} {record["sent"]}'
+            f' "{record["referer"] or "-"}" "{record["user_agent"] or "-"}" {record["duration"]}'
+        )
+        return f'{line.translate(BaseHandler._control_char_table)}\n'.encode()
+
+
+class Profiler:
+
+    def __init__(self, directory, pattern=None, aggregate=False):
+        self._directory = directory
+        self._pattern = pattern
+        self._aggregate = aggregate
+        self._active = threading.Lock()
+        self._lock = threading.Lock()
+        self._count = 0
+        self._stats = None
+        self._dumped = time.monotonic()
+
+    def start(self):
+        os.makedirs(self._directory, exist_ok=True)
+        atexit.register(self.close)
+
+    @contextlib.contextmanager
+    def profile(self):
+        if not self._active.acquire(blocking=False):
+            yield None
+            return
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                yield None
+                return
+            try:
+                yield profile
+            finally:
+                profile.disable()
+        finally:
+            self._active.release()
+
+    def save(self, profile, method, path):
+        if self._pattern and not fnmatch.fnmatchcase(path, self._pattern):
+            return
+        with self._lock:
+            self._count += 1
+            if not self._aggregate:
+                t = time.strftime('%Y%m%d-%H%M%S')
+                name = f'{t}-{os.getpid()}-{self._count:06d}-{method}-{parse.quote(path, safe="")[:100]}'
+                profile.dump_stats(os.path.join(self._directory, f'{name}.prof'))
+                return
+            if self._stats:
+                self._stats.add(profile)
+            else:
+                self._stats = pstats.Stats(profile)
+            if time.monotonic() - self._dumped >= 10:
+                self._dump()
+
+    def close(self):
+        with self._lock:
+            if self._stats:
+                self._dump()
+
+    def _dump(self):
+        self._stats.dump_stats(os.path.join(self._directory, f'aggregate-{os.getpid()}.prof'))
+        self._dumped = time.monotonic()
+
+
+class HashIndex:
+
+    schema_version = 1
+
+    def __init__(self, path):
+        self._path = path
+        self._connection = None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(1000)
+        self._pending = set()
+
+    def start(self):
+        self._connection = sqlite3.connect(
+            self._path, timeout=10, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS hashes (file TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 BLOB, path TEXT)'
+        )
+        version = self._connection.execute('PRAGMA user_version').fetchone()[0]
+        if version < 1:
+            columns = {row[1] for row in self._connection.execute('PRAGMA table_info(hashes)')}
+            if 'path' not in columns:
+                self._connection.execute('ALTER TABLE hashes ADD COLUMN path TEXT')
+        if version < self.schema_version:
+            self._connection.execute(f'PRAGMA user_version = {self.schema_version}')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS hashes_sha256 ON hashes (sha256)')
+        threading.Thread(target=self._hash_forever, daemon=True).start()
+
+    def get(self, st):
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    'SELECT size, mtime_ns, sha256 FROM hashes WHERE file = ?',
+                    (f'{st.st_dev}:{st.st_ino}',),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        if not row or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            return None
+        return row[2]
+
+    def put(self, path, f, st, digest):
+        now = os.fstat(f.fileno())
+        if now.st_size != st.st_size or now.st_mtime_ns != st.st_mtime_ns:
+            return
+        try:
+            with self._lock:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)',
+                    (f'{st.st_dev}:{st.st_ino}', st.st_size, st.st_mtime_ns, digest, path),
+                )
+        except sqlite3.Error:
+            pass
+
+    def find(self, digest, size):
+        try:
+            with self._lock:
+                rows = self._connection.execute(
+                    'SELECT path FROM hashes WHERE sha256 = ? AND size = ?', (digest, size)
+                ).fetchall()
+        except sqlite3.Error:
+            return []
+        return [row[0] for row in rows]
+
+    def request(self, path):
+        with self._lock:
+            if path in self._pending:
+                return
+            self._pending.add(path)
+        try:
+            self._queue.put_nowait(path)
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(path)
+
+    def _hash_forever(self):
+        buffer = memoryview(bytearray(262144))
+        while True:
+            path = self._queue.get()
+            try:
+                with open(path, 'rb', buffering=0) as f:
+                    st = os.fstat(f.fileno())
+                    if self.get(st) is None:
+                        self.put(path, f, st, hash_file(f, buffer))
+            except OSError:
+                pass
+            finally:
+                with self._lock:
+                    self._pending.discard(path)
+
+
+class SearchIndex:
+
+    def __init__(self, root, interval, all_files):
+        self._root = root
+        self._interval = interval
+        self._all = all_files
+        self._snapshot = None
+
+    def start(self):
+        threading.Thread(target=self._scan_forever, daemon=True).start()
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def _scan_forever(self):
+        while True:
+            try:
+                self._snapshot = self._scan()
+            except (OSError, MemoryError) as e:
+                sys.stderr.write(f'Failed to index {self._root}: {e}\n')
+            if self._interval <= 0:
+                return
+            time.sleep(self._interval)
+
+    def _scan(self):
+        names, folded = [], []
+        parents = array.array('l')
+        sizes = array.array('q')
+        dirs = collections.deque([(self._root, -1)])
+        while dirs:
+            dir_path, parent = dirs.popleft()
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            for entry in entries:
+                name = entry.name
+                if not self._all and name.startswith('.'):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                    size = -1 if is_dir else entry.stat().st_size
+                except OSError:
+                    continue
+                if is_dir and not entry.is_symlink():
+                    dirs.append((entry.path, len(names)))
+                lower = name.lower()
+                names.append(name)
+                folded.append(lower if len(lower) == len(name) else name)
+                parents.append(parent)
+                sizes.append(size)
+        starts = array.array('q', itertools.accumulate((len(n) + 1 for n in names), initial=1))
+        return (
+            '\0' + '\0'.join(names) + '\0',
+            '\0' + '\0'.join(folded) + '\0',
+            starts,
+            parents,
+            sizes,
+        )
+
+    def search(self, query):
+        terms = query.replace('\0', '').lower().split()
+        snapshot = self._snapshot
+        if not terms or snapshot is None:
+            return
+        names, folded, starts, parents, sizes = snapshot
+        if len(terms) > 1:
+            terms.sort(key=folded.count)
+        term = terms.pop(0)
+        for kind, pattern in enumerate((f'\0{term}\0', f'\0{term}', term)):
+            offset = 1 if kind < 2 else 0
+            pos = folded.find(pattern)
+            while pos != -1:
+                i = bisect.bisect_right(starts, pos + offset) - 1
+                start, end = starts[i], starts[i + 1] - 1
+                skip = end - start == len(term) if kind == 1 else kind == 2 and pos == start
+                pos = folded.find(pattern, end + 1 - offset)
+                if skip or terms and not all(t in folded[start:end] for t in terms):
+                    continue
+                path = names[start:end]
+                parent = parents[i]
+                while parent != -1:
+                    path = f'{names[starts[parent] : starts[parent + 1] - 1]}/{path}'
+                    parent = parents[parent]
+                yield path, sizes[i]
+
+
+class BlockCache:
+
+    def __init__(self, max_size=67108864):
+        self._max_size = max_size
+        self._size = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self._max_size:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self._max_size:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+
+
+class WorkerStats:
+
+    fields = ('pid', 'restarts', 'connections', 'requests', 'errors')
+
+    def __init__(self, workers):
+        self._workers = workers
+        self._mmap = mmap.mmap(-1, workers * len(self.fields) * 8)
+        self._values = memoryview(self._mmap).cast('q')
+        self._lock = threading.Lock()
+        self._offset = None
+
+    def select(self, worker):
+        self._offset = worker * len(self.fields)
+
+    def set(self, worker, field, value):
+        self._values[worker * len(self.fields) + self.fields.index(field)] = value
+
+    def get(self, worker, field):
+        return self._values[worker * len(self.fields) + self.fields.index(field)]
+
+    def add(self, field, value=1):
+        i = self._offset + self.fields.index(field)
+        with self._lock:
+            self._values[i] += value
+
+    def format(self):
+        lines = ['worker\t' + '\t'.join(self.fields)]
+        totals = [0] * len(self.fields)
+        for worker in range(self._workers):
+            values = [self.get(worker, field) for field in self.fields]
+            lines.append(f'{worker}\t' + '\t'.join(map(str, values)))
+            totals = [t + v for t, v in zip(totals, values)]
+        totals[0] = '-'
+        lines.append('total\t' + '\t'.join(map(str, totals)))
+        lines.append('')
+        return '\n'.join(lines)
+
 
 def get_best_family(host, port):
     info = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE)
@@ -1642,10 +3599,11 @@ def print_prompt():
         sys.stderr.write('Enter your text, then press Ctrl + D:\n')
 
 
-def create_ssl_context(certfile, keyfile=None, password=None):
+def create_ssl_context(certfile, keyfile=None, password=None, tickets=2):
     ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
     ctx.minimum_version = ssl.TLSVersion.TLSv1_3
     ctx.load_cert_chain(certfile=certfile, keyfile=keyfile, password=password)
+    ctx.num_tickets = tickets
     return ctx
 
 
@@ -1664,15 +3622,390 @@ def print_qrcode(text):
             pass
 
 
-def start_server(address, port, certfile, keyfile, keypass, handler_class, show_qrcode):
+def get_data_regions(fd, st):
+    if not hasattr(os, 'SEEK_HOLE') or st.st_blocks * 512 >= st.st_size:
+        return None
+    regions = []
+    offset = 0
+    try:
+        while offset < st.st_size:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+            offset = min(os.lseek(fd, start, os.SEEK_HOLE), st.st_size)
+            regions.append((start, offset - start))
+    except OSError as e:
+        if e.errno != errno.ENXIO:
+            return None
+    finally:
+        os.lseek(fd, 0, os.SEEK_SET)
+    if regions == [(0, st.st_size)]:
+        return None
+    return regions
+
+
+def parse_digests(headers):
+    digests = {}
+    for name in ('content-digest', 'repr-digest', 'digest'):
+        for key, value in headers:
+            if key.lower() != name:
+                continue
+            for item in value.split(','):
+                algorithm, _, value = item.strip().partition('=')
+                algorithm = algorithm.lower()
+                if algorithm not in ('sha-256', 'sha-512') or algorithm in digests:
+                    continue
+                if name != 'digest':
+                    if len(value) < 2 or value[0] != ':' or value[-1] != ':':
+                        continue
+                    value = value[1:-1]
+                try:
+                    digest = base64.b64decode(value, validate=True)
+                except ValueError:
+                    continue
+                if len(digest) == new_hash(algorithm).digest_size:
+                    digests[algorithm] = digest
+    return digests
+
+
+def new_hash(algorithm):
+    return hashlib.new(algorithm.replace('-', ''))
+
+
+def get_real_url(root, path):
+    path = os.path.realpath(path)
+    if path == root:
+        return '/'
+    if not path.startswith(os.path.join(root, '')):
+        return None
+    return '/' + os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def get_staging_path(file_path):
+    head, tail = os.path.split(file_path)
+    return f'{head}/.{tail}.{os.urandom(4).hex()}.part'
+
+
+def get_missing_dirs(path):
+    missing = []
+    while not os.path.lexists(path):
+        missing.append(path)
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return missing[::-1]
+
+
+def undo_extraction(created, replaced):
+    for backup, dest in reversed(replaced):
+        with contextlib.suppress(OSError):
+            os.replace(backup, dest)
+    remove_paths(reversed(created))
+
+
+def remove_paths(paths):
+    for path in paths:
+        with contextlib.suppress(OSError):
+            if os.path.isdir(path) and not os.path.islink(path):
+                os.rmdir(path)
+            else:
+                os.unlink(path)
+
+
+def format_digests(digests):
+    return ', '.join(f'{k}=:{base64.b64encode(v).decode()}:' for k, v in digests.items())
+
+
+def hash_file(reader, buffer):
+    digest = hashlib.sha256()
+    while n := reader.readinto(buffer):
+        digest.update(buffer[:n])
+    return digest.digest()
+
+
+def copy_file(src, dst, size, buffer):
+    if fcntl and hasattr(fcntl, 'FICLONE'):
+        try:
+            fcntl.ioctl(dst.fileno(), fcntl.FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+    while size:
+        n = src.readinto(buffer[: min(size, len(buffer))])
+        if not n:
+            raise EOFError
+        dst.write(buffer[:n])
+        size -= n
+
+
+def get_block_checksums(reader, size, block_size):
+    buffer = memoryview(bytearray(block_size))
+    lines = [f'{size} {block_size}\n']
+    while size:
+        view = buffer[: min(size, block_size)]
+        filled = 0
+        while filled < len(view):
+            n = reader.readinto(view[filled:])
+            if not n:
+                raise EOFError
+            filled += n
+        strong = hashlib.blake2b(view, digest_size=16).hexdigest()
+        lines.append(f'{zlib.adler32(view):08x} {strong}\n')
+        size -= len(view)
+    return ''.join(lines).encode()
+
+
+def parse_size(size):
+    units = {'K': 1024, 'M': 1048576, 'G': 1073741824}
+    unit = units.get(size[-1:].upper())
+    if unit:
+        size = size[:-1]
+    if not size.isdecimal():
+        raise ValueError(f'invalid size: {size}')
+    return int(size) * (unit if unit else 1)
+
+
+def match_blocks(data, blocks, block_size, size):
+    found = {}
+    index = {}
+    for i, (weak, strong) in enumerate(blocks):
+        offset = i * block_size
+        length = min(block_size, size - offset)
+        block = data[offset : offset + length]
+        if (
+            len(block) == length
+            and zlib.adler32(block) == weak
+            and hashlib.blake2b(block, digest_size=16).hexdigest() == strong
+        ):
+            found[i] = offset
+        elif length == block_size:
+            index.setdefault(weak, {}).setdefault(strong, []).append(i)
+        elif length <= len(data):
+            block = data[len(data) - length :]
+            if (
+                zlib.adler32(block) == weak
+                and hashlib.blake2b(block, digest_size=16).hexdigest() == strong
+            ):
+                found[i] = len(data) - length
+    spans = []
+    start = 0
+    for offset in found.values():
+        if offset > start:
+            spans.append((start, offset))
+        start = offset + block_size
+    if start < len(data):
+        spans.append((start, len(data)))
+    misses, max_misses = 0, max(block_size * 4, 4194304)
+    for start, end in spans:
+        pos = start
+        weak = None
+        while index and pos < end and pos + block_size <= len(data):
+            if weak is None:
+                weak = zlib.adler32(data[pos : pos + block_size])
+            strongs = index.get(weak)
+            if strongs:
+                strong = hashlib.blake2b(data[pos : pos + block_size], digest_size=16).hexdigest()
+                indexes = strongs.pop(strong, None)
+                if indexes:
+                    if not strongs:
+                        del index[weak]
+                    for i in indexes:
+                        found[i] = pos
+                    pos += block_size
+                    weak = None
+                    misses = 0
+                    continue
+            if pos + block_size == len(data):
+                break
+            misses += 1
+            if misses > max_misses:
+                return found
+            out, new = data[pos], data[pos + block_size]
+            a = ((weak & 0xFFFF) - out + new) % 65521
+            b = ((weak >> 16) - block_size * out + a - 1) % 65521
+            weak = (b << 16) | a
+            pos += 1
+    return found
+
+
+def pull(url, dest, block_size, password=None, insecure=False):
+    url = parse.urlsplit(url)
+    if os.path.isdir(dest):
+        name = parse.unquote(url.path.rpartition('/')[2])
+        if not name:
+            raise ValueError(f'no file name in {url.geturl()}')
+        dest = os.path.join(dest, name)
+    if url.scheme == 'https':
+        ctx = ssl.create_default_context()
+        if insecure:
+            ctx.check_hostname = False
+            ctx.verify_mode = ssl.CERT_NONE
+        conn = http.client.HTTPSConnection(url.netloc, timeout=60, context=ctx)
+    else:
+        conn = http.client.HTTPConnection(url.netloc, timeout=60)
+    headers = {'User-Agent': 'share', 'Accept': 'text/plain'}
+    if password:
+        credential = base64.b64encode(f'user:{password}'.encode()).decode()
+        headers['Authorization'] = f'Basic {credential}'
+    query = f'{url.query}&blocks={block_size}' if url.query else f'blocks={block_size}'
+    conn.request('GET', f'{url.path}?{query}', headers=headers)
+    response = conn.getresponse()
+    body = response.read()
+    if response.status != HTTPStatus.OK:
+        raise ConnectionError(f'{url.geturl()}: {response.status} {response.reason}')
+    lines = body.decode().splitlines()
+    size, block_size = map(int, lines[0].split())
+    blocks = [(int(weak, 16), strong) for weak, strong in map(str.split, lines[1:])]
+    tmp = f'{dest}.part'
+    fetched = ranges = 0
+    with contextlib.ExitStack() as stack:
+        data = b''
+        try:
+            f = stack.enter_context(open(dest, 'rb'))
+            if os.fstat(f.fileno()).st_size:
+                data = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        except FileNotFoundError:
+            pass
+        found = match_blocks(data, blocks, block_size, size)
+        if len(data) == size and all(found.get(i) == i * block_size for i in range(len(blocks))):
+            sys.stderr.write(f'{dest} is up to date\n')
+            return
+        try:
+            with open(tmp, 'wb') as out:
+                i = 0
+                while i < len(blocks):
+                    if i in found:
+                        out.write(
+                            data[found[i] : found[i] + min(block_size, size - i * block_size)]
+                        )
+                        i += 1
+                        continue
+                    j = i
+                    while j < len(blocks) and j not in found:
+                        j += 1
+                    start, end = i * block_size, min(j * block_size, size)
+                    conn.request(
+                        'GET', url.path, headers={**headers, 'Range': f'bytes={start}-{end - 1}'}
+                    )
+                    response = conn.getresponse()
+                    if response.status != HTTPStatus.PARTIAL_CONTENT:
+                        raise ConnectionError(
+                            f'{url.geturl()}: {response.status} {response.reason}'
+                        )
+                    for k in range(i, j):
+                        block = response.read(min(block_size, size - k * block_size))
+                        if hashlib.blake2b(block, digest_size=16).hexdigest() != blocks[k][1]:
+                            raise ValueError(f'{url.geturl()} changed during the pull')
+                        out.write(block)
+                    response.read()
+                    fetched += end - start
+                    ranges += 1
+                    i = j
+        except BaseException:
+            os.unlink(tmp)
+            raise
+    os.replace(tmp, dest)
+    sys.stderr.write(f'{dest}: fetched {fetched} of {size} bytes in {ranges} ranges\n')
+
+
+def serve(server, ctx):
+    if ctx:
+        server.socket = ctx.wrap_socket(
+            server.socket, server_side=True, do_handshake_on_connect=False
+        )
+    server.serve_forever()
+
+
+def serve_reuse_port(server_address, handler_class, ctx):
+    with ShareServer(server_address, handler_class) as server:
+        serve(server, ctx)
+
+
+def run_workers(workers, target, stats):
+    pids, started = {}, {}
+
+    def spawn(worker):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                signal.signal(signal.SIGTERM, lambda a, b: sys.exit(0))
+                signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+                stats.select(worker)
+                if BaseHandler.metrics:
+                    BaseHandler.metrics.select(worker)
+                if BaseHandler.access_log:
+                    BaseHandler.access_log.select(worker)
+                if BaseHandler.profiler:
+                    BaseHandler.profiler.start()
+                if BaseHandler.hash_index:
+                    BaseHandler.hash_index.start()
+                if BaseHandler.search_index:
+                    BaseHandler.search_index.start()
+                target()
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                if BaseHandler.access_log:
+                    BaseHandler.access_log.close()
+                if BaseHandler.profiler:
+                    BaseHandler.profiler.close()
+                os._exit(code)
+        pids[pid] = worker
+        started[worker] = time.monotonic()
+        stats.set(worker, 'pid', pid)
+
+    signal.signal(signal.SIGTERM, on_interrupt)
+    signal.signal(signal.SIGUSR1, lambda a, b: sys.stderr.write(stats.format()))
+    try:
+        for worker in range(workers):
+            spawn(worker)
+        while True:
+            pid, status = os.wait()
+            worker = pids.pop(pid, None)
+            if worker is None:
+                continue
+            sys.stderr.write(
+                f'Worker {worker} (pid {pid}) exited with code {os.waitstatus_to_exitcode(status)}, restarting ...\n'
+            )
+            stats.set(worker, 'restarts', stats.get(worker, 'restarts') + 1)
+            if time.monotonic() - started[worker] < 1:
+                time.sleep(1)
+            spawn(worker)
+    finally:
+        for pid in pids:
+            os.kill(pid, signal.SIGTERM)
+        for pid in pids:
+            os.waitpid(pid, 0)
+
+
+def start_server(
+    address,
+    port,
+    certfile,
+    keyfile,
+    keypass,
+    handler_class,
+    show_qrcode,
+    workers=1,
+    tls_tickets=2,
+):
     family, addr = get_best_family(address, port)
     ShareServer.address_family = family
-    with ShareServer(addr, handler_class) as server:
+    if workers > 1 and not hasattr(os, 'fork'):
+        raise ValueError('multiple workers are not supported on this platform')
+    reuse_port = workers > 1 and sys.platform == 'linux'
+    ShareServer.allow_reuse_port = reuse_port
+    with ShareServer(addr, handler_class, bind_and_activate=not reuse_port) as server:
+        if reuse_port:
+            server.server_bind()
         if certfile:
-            ctx = create_ssl_context(certfile, keyfile, keypass)
-            server.socket = ctx.wrap_socket(server.socket, server_side=True)
+            ctx = create_ssl_context(certfile, keyfile, keypass, tls_tickets)
             https = True
         else:
+            ctx = None
             https = False
         host, port = server.socket.getsockname()[:2]
         ip = addr[0]
@@ -1686,7 +4019,24 @@ def start_server(address, port, certfile, keyfile, keypass, handler_class, show_
         )
         if show_qrcode:
             print_qrcode(url)
-        server.serve_forever()
+        if workers > 1:
+            if reuse_port:
+                target = functools.partial(
+                    serve_reuse_port, server.server_address, handler_class, ctx
+                )
+            else:
+                target = functools.partial(serve, server, ctx)
+            run_workers(workers, target, BaseHandler.stats)
+        else:
+            if BaseHandler.access_log:
+                BaseHandler.access_log.start()
+            if BaseHandler.profiler:
+                BaseHandler.profiler.start()
+            if BaseHandler.hash_index:
+                BaseHandler.hash_index.start()
+            if BaseHandler.search_index:
+                BaseHandler.search_index.start()
+            serve(server, ctx)
 
 
 def main():
@@ -1734,15 +4084,192 @@ def main():
         help='a rule for authentication, can be used multiple times [default: *]',
     )
     general.add_argument('-q', '--qrcode', action='store_true', help='show the qrcode')
+    general.add_argument(
+        '--index',
+        type=float,
+        metavar='SECONDS',
+        help='index the names in the shared directory in the background for ?search, rescanning it every SECONDS, 0 to scan it only once (only for directory)',
+    )
+    general.add_argument(
+        '--pull',
+        metavar='URL',
+        help='update the file given as argument (or in the current directory) from a shared file at URL, downloading only the blocks that changed',
+    )
+    general.add_argument(
+        '-k',
+        '--insecure',
+        action='store_true',
+        help='do not verify the tls certificate of the server for --pull, e.g. a self-signed one',
+    )
+    general.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='number of worker processes (not for Windows) [default: 1]',
+    )
     general.add_argument('-h', '--help', action='help', help='show this help message and exit')
     general.add_argument(
         '-v', '--version', action='store_true', help='show version number and exit'
     )
 
+    sock = parser.add_argument_group('socket options')
+    sock.add_argument(
+        '--backlog',
+        type=int,
+        default=128,
+        metavar='N',
+        help='listen backlog of the server [default: 128]',
+    )
+    sock.add_argument(
+        '--send-buffer',
+        metavar='SIZE',
+        type=parse_size,
+        help='SO_SNDBUF of connections, e.g. 256K [default: system]',
+    )
+    sock.add_argument(
+        '--receive-buffer',
+        metavar='SIZE',
+        type=parse_size,
+        help='SO_RCVBUF of connections, e.g. 256K [default: system]',
+    )
+    sock.add_argument(
+        '--chunk-size',
+        type=parse_size,
+        default=65536,
+        metavar='SIZE',
+        help='target size of chunks in chunked responses [default: 64K]',
+    )
+    sock.add_argument(
+        '--no-nodelay', action='store_true', help='do not set TCP_NODELAY on connections'
+    )
+
+    transfer = parser.add_argument_group('transfer options')
+    transfer.add_argument(
+        '--disk-io-size',
+        type=parse_size,
+        default=262144,
+        metavar='SIZE',
+        help='size of each read from files being downloaded [default: 256K]',
+    )
+    transfer.add_argument(
+        '--socket-io-size',
+        type=parse_size,
+        default=65536,
+        metavar='SIZE',
+        help='size of each read from connections while uploading [default: 64K]',
+    )
+    transfer.add_argument(
+        '--readahead-size',
+        type=parse_size,
+        default=4194304,
+        metavar='SIZE',
+        help='ask the kernel to read files this far ahead while sending them, 0 to disable [default: 4M]',
+    )
+    transfer.add_argument(
+        '--drop-cache-size',
+        type=parse_size,
+        default=268435456,
+        metavar='SIZE',
+        help='drop transferred files of at least SIZE from the page cache, 0 to disable [default: 256M]',
+    )
+    transfer.add_argument(
+        '--block-size',
+        type=parse_size,
+        default=131072,
+        metavar='SIZE',
+        help='size of the blocks compared by --pull and ?blocks [default: 128K]',
+    )
+    transfer.add_argument(
+        '--hash-index',
+        metavar='FILE',
+        help='remember sha-256 digests of shared files in the sqlite database FILE and send them in Repr-Digest headers',
+    )
+    transfer.add_argument(
+        '--max-upload-size',
+        type=parse_size,
+        metavar='SIZE',
+        help='refuse uploads larger than SIZE before receiving them [default: unlimited]',
+    )
+    transfer.add_argument(
+        '--write-behind-size',
+        type=parse_size,
+        default=8388608,
+        metavar='SIZE',
+        help='queue up to SIZE of each upload in memory for a separate writer thread, 0 to disable [default: 8M]',
+    )
+
+    monitoring = parser.add_argument_group('monitoring options')
+    monitoring.add_argument(
+        '--metrics',
+        metavar='PATH',
+        help='serve metrics in the prometheus text format at PATH, e.g. /metrics',
+    )
+    monitoring.add_argument(
+        '--access-log',
+        metavar='FILE',
+        help='write an access log to FILE, one file per worker with -w',
+    )
+    monitoring.add_argument(
+        '--access-log-format',
+        choices=('json', 'combined'),
+        default='json',
+        help='format of the access log [default: json]',
+    )
+    monitoring.add_argument(
+        '--access-log-max-size',
+        type=parse_size,
+        default=104857600,
+        metavar='SIZE',
+        help='rotate the access log when it grows beyond SIZE [default: 100M]',
+    )
+    monitoring.add_argument(
+        '--access-log-backups',
+        type=int,
+        default=5,
+        metavar='N',
+        help='number of rotated access logs to keep [default: 5]',
+    )
+    monitoring.add_argument(
+        '--server-timing',
+        action='store_true',
+        help='report the time spent in each phase of a request in a Server-Timing header',
+    )
+    monitoring.add_argument(
+        '--profile',
+        metavar='DIR',
+        help='profile requests with cProfile and write the results to DIR',
+    )
+    monitoring.add_argument(
+        '--profile-path',
+        metavar='PATTERN',
+        help='only keep profiles of request paths matching PATTERN, e.g. /photos/*',
+    )
+    monitoring.add_argument(
+        '--profile-aggregate',
+        action='store_true',
+        help='merge profiles into one file per process instead of one file per request',
+    )
+
     tls = parser.add_argument_group('tls options')
     tls.add_argument('--certfile', help='cert file')
     tls.add_argument('--keyfile', help='key file')
     tls.add_argument('--keypass', help='key password')
+    tls.add_argument(
+        '--handshake-timeout',
+        type=float,
+        default=10,
+        metavar='SECONDS',
+        help='timeout of tls handshakes [default: 10]',
+    )
+    tls.add_argument(
+        '--tls-tickets',
+        type=int,
+        default=2,
+        metavar='N',
+        help='number of session tickets sent after each full handshake, 0 to disable resumption [default: 2]',
+    )
 
     args = parser.parse_args()
     if args.version:
@@ -1750,6 +4277,10 @@ def main():
         return
     if args.password and len(args.password) < 3:
         raise ValueError('password is too short')
+    if args.pull:
+        dest = args.arguments[0] if args.arguments else os.getcwd()
+        pull(args.pull, dest, args.block_size, args.password, args.insecure)
+        return
     if not args.receive:
         args.share = True
     if args.share and args.receive:
@@ -1803,6 +4334,45 @@ def main():
             handler_class = functools.partial(FileReceiveHandler, dir_path)
     BaseHandler.authenticator = Authenticator(args.password)
     BaseHandler.rule_matcher = AuthRuleMatcher(args.rule if args.rule else ['*'])
+    BaseHandler.chunk_size = args.chunk_size
+    BaseHandler.disk_io_size = max(args.disk_io_size, 4096)
+    BaseHandler.socket_io_size = max(args.socket_io_size, 4096)
+    BaseHandler.readahead_size = args.readahead_size
+    BaseHandler.drop_cache_size = args.drop_cache_size
+    BaseHandler.block_size = args.block_size
+    BaseHandler.block_cache = BlockCache()
+    BaseHandler.max_upload_size = args.max_upload_size
+    BaseHandler.write_behind_size = args.write_behind_size
+    if args.hash_index:
+        if not sqlite3:
+            raise ModuleNotFoundError('--hash-index requires the sqlite3 module')
+        BaseHandler.hash_index = HashIndex(os.path.abspath(args.hash_index))
+    if args.index is not None:
+        if getattr(handler_class, 'func', None) is not DirectoryShareHandler:
+            raise ValueError('--index is only for directory')
+        BaseHandler.search_index = SearchIndex(dir_path, args.index, args.all)
+    if args.workers > 1:
+        BaseHandler.stats = WorkerStats(args.workers)
+    if args.metrics:
+        BaseHandler.metrics = Metrics(args.workers)
+        BaseHandler.metrics_path = '/' + args.metrics.strip('/')
+    if args.access_log:
+        BaseHandler.access_log = AccessLog(
+            os.path.abspath(args.access_log),
+            args.access_log_format,
+            args.access_log_max_size,
+            args.access_log_backups,
+        )
+    BaseHandler.server_timing = args.server_timing
+    if args.profile:
+        BaseHandler.profiler = Profiler(
+            os.path.abspath(args.profile), args.profile_path, args.profile_aggregate
+        )
+    ShareServer.request_queue_size = args.backlog
+    ShareServer.send_buffer_size = args.send_buffer
+    ShareServer.receive_buffer_size = args.receive_buffer
+    ShareServer.tcp_nodelay = not args.no_nodelay
+    ShareServer.handshake_timeout = args.handshake_timeout
     start_server(
         args.address,
         args.port,
@@ -1811,7 +4381,10 @@ def main():
         args.keypass,
         handler_class,
         args.qrcode,
+        args.workers,
+        args.tls_tickets,
     )
 
 
-main()
+if __name__ == '__main__':
+    main()